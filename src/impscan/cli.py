@@ -1,9 +1,14 @@
+import subprocess
+import sys
 from argparse import ArgumentParser
 from pathlib import Path
 
 from .config import EnvConfig
 from .lookup import lookup_requirements
-from .scanner.scan import scan_imports
+from .scanner.ast_utils import extractors
+from .scanner.module_utils import load_stdlib_module_names, stdlib_module_names
+from .scanner.requirement import EnvReqs
+from .scanner.scan import scan_imports_many
 
 # import argcomplete
 
@@ -13,7 +18,11 @@ __all__ = ["main"]
 def main():
     desc = "Scan imports and produce summary files for environment setup"
     parser = ArgumentParser(description=desc)
-    parser.add_argument("source_path", help="Input path to scan Python files in")
+    parser.add_argument(
+        "source_path",
+        nargs="+",
+        help="Input path(s) to scan Python files in",
+    )
     parser.add_argument(
         "-q",
         "--quiet",
@@ -33,24 +42,122 @@ def main():
         action="store_true",
         help="Produce dev build requirements (do not drop requirements marked 'build-system')",
     )
+    parser.add_argument(
+        "-i",
+        "--ignore",
+        action="append",
+        default=[],
+        help="Skip files and directories with names matching a glob",
+    )
+    parser.add_argument(
+        "--no-gitignore",
+        action="store_true",
+        help="Scan files even if ignored by a .gitignore file",
+    )
     parser.add_argument(
         "-v",
         "--version",
         action="store",
         help="Specify a Python version",
     )
+    parser.add_argument(
+        "--stdlib-list",
+        help="File listing the stdlib module names of the target Python (one per "
+        "line) rather than detecting them",
+    )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes to scan files with (default: 1, 0 for all cores)",
+    )
+    parser.add_argument(
+        "-x",
+        "--extractor",
+        choices=extractors,
+        default="ast",
+        help="Find imports by parsing each file's AST, or scan for them (only "
+        "parsing if ambiguous) which is faster (default: ast)",
+    )
+    parser.add_argument(
+        "-n",
+        "--nested",
+        action="store_true",
+        help="Also find imports in functions, try blocks, under TYPE_CHECKING etc. "
+        "(and report the contexts imports are found in)",
+    )
+    parser.add_argument(
+        "-c",
+        "--cache",
+        action="store_true",
+        help="Cache each file's imports (in the source directory) to skip parsing "
+        "unchanged files on the next run",
+    )
+    parser.add_argument(
+        "-p",
+        "--progress",
+        action="store_true",
+        help="Show the number of files scanned so far (on STDERR)",
+    )
 
     # argcomplete.autocomplete(parser)
     arg_l = parser.parse_args()
 
-    source_path = Path(arg_l.source_path).absolute()
+    if arg_l.workers < 0:
+        parser.error("--workers must be 0 (for all CPU cores) or more")
+    source_paths = [Path(p).absolute() for p in arg_l.source_path]
+    if arg_l.stdlib_list:
+        stdlib_modules = load_stdlib_module_names(Path(arg_l.stdlib_list))
+    else:
+        try:
+            stdlib_modules = stdlib_module_names(arg_l.version)
+        except (FileNotFoundError, subprocess.CalledProcessError) as e:
+            parser.error(
+                f"Cannot list the stdlib modules of Python {arg_l.version} ({e}): "
+                "pass them in a file with --stdlib-list instead",
+            )
 
     cfg = EnvConfig(
         report=not arg_l.quiet,
         banned_imports=arg_l.exclude,
         build_system=arg_l.build,
+        workers=arg_l.workers,
+        cache=arg_l.cache,
+        extractor=arg_l.extractor,
+        nested=arg_l.nested,
+        ignore_globs=arg_l.ignore,
+        gitignore=not arg_l.no_gitignore,
+        python_version=arg_l.version,
+        stdlib_modules=stdlib_modules,
+        keep_files=False,  # Only the imports are reported
     )
-    reqs = scan_imports(source_path=source_path, env_config=cfg)
+    n_scanned = 0
+
+    def show_progress(file_imports):
+        nonlocal n_scanned
+        n_scanned += 1
+        print(f"\rScanned {n_scanned} files", end="", file=sys.stderr)
+
+    reqs_per_root = scan_imports_many(
+        source_paths=source_paths,
+        env_config=cfg,
+        on_file=show_progress if arg_l.progress else None,
+    )
+    if arg_l.progress:
+        print(file=sys.stderr)
+    reqs = EnvReqs.combined(reqs_per_root)
     if reqs.env_config.report:
+        if len(source_paths) > 1:
+            for path, root_reqs in zip(source_paths, reqs_per_root):
+                print(f"Registered imports in {path}: {root_reqs.registered_imports}")
         print(f"Registered imports: {reqs.registered_imports}")
-    reqs_info = lookup_requirements(reqs)
+        if reqs.env_config.nested:
+            for name, contexts in sorted(reqs.import_contexts.items()):
+                print(f"  {name}: {', '.join(sorted(c.value for c in contexts))}")
+        n_fallback, n_files = reqs.n_fallback_decoded, reqs.n_files
+        print(f"Decoded {n_fallback}/{n_files} files via chardet fallback")
+    conda_reqs, pypi_reqs = lookup_requirements(reqs)
+    if reqs.env_config.report:
+        for channel, specs in conda_reqs.items():
+            print(f"Conda packages ({channel}): {[s.package for s in specs]}")
@@ -2,18 +2,19 @@ from __future__ import annotations
 
 import json
 import tarfile
-import zipfile
 from pathlib import Path
 from sys import stderr
 
-from .so_utils import verify_exported_module_name
-from .tar_utils import open_tarfile_from_url, read_bz2_paths
+from range_streams.codecs.conda import CondaStream
+
+from .so_utils import verify_exported_module_names
+from .tar_utils import read_bz2_paths
 from .url_utils import (
     ArchiveType,
     detect_archive_type_from_url,
     detect_channel_from_url,
 )
-from .zip_utils import open_zipfile_from_url, read_zipped_zst
+from .zip_utils import read_streamed_zst
 
 __all__ = ["CondaArchive"]
 
@@ -26,6 +27,7 @@ class CondaArchive:
     path_json = None
     about_json = None
     index_json = None
+    bz2_info = None  # .tar.bz2 info files, streamed when the archive is pulled
 
     def __init__(self, source_url: str, defer_pull: bool = False):
         self.url = source_url
@@ -37,40 +39,24 @@ class CondaArchive:
 
     def pull(self) -> None:
         if self.is_zstd:
-            try:
-                archive = open_zipfile_from_url(self.url)
-            except zipfile.BadZipFile:
-                print(f"Bad zip file: {url=}", file=stderr)
-                raise
-            else:
-                assert isinstance(
-                    archive,
-                    zipfile.ZipFile,
-                ), f"Unexpected {type(archive)=}"
-                self.zip = archive
+            # Only the zip central directory is read until a member is requested
+            self.zip = CondaStream(url=self.url)
         elif self.is_bz2:
+            # Stream only the info files (at the start of the tarball) for now
             try:
-                archive = open_tarfile_from_url(self.url)
+                self.bz2_info = self.read_bz2(self.info_fields)
             except tarfile.TarError:
-                print(f"Bad tarball: {url=}", file=stderr)
+                print(f"Bad tarball: {self.url=}", file=stderr)
                 raise
-            else:
-                assert isinstance(
-                    archive,
-                    tarfile.TarFile,
-                ), f"Unexpected {type(archive)=}"
-                self.bz2 = archive
         else:
             raise ValueError(f"{archive_type=} is not a valid ArchiveType")
         if self.archive_type is ArchiveType.Zstd:
-            # info_zst is used for info_bytes by read_zipped_zst
+            # info_zst is used for info_bytes by read_zst
             try:
                 self.meta_json, info_z, pkg_z = self.zst_meta_and_tarballs()
                 self.info_zst, self.pkg_zst = info_z, pkg_z
             except:
                 raise NotImplementedError  # breakpoint here
-        else:
-            self.check_bz2_info_dir()
 
     @property
     def is_zstd(self):
@@ -82,21 +68,17 @@ class CondaArchive:
 
     @property
     def archive(self):
-        return self.zip if self.is_zstd else self.bz2
+        return self.zip if self.is_zstd else None  # .tar.bz2 members are streamed
 
     @property
     def members(self):
-        return self.archive.namelist() if self.is_zstd else self.archive.getnames()
-
-    def check_bz2_info_dir(self) -> None:
         """
-        Validate the members for assignment to instance attributes.
-        Note: 'members' means the filenames within the compressed .tar.bz2 archive.
+        The filenames within the .conda archive. A .tar.bz2 archive is streamed
+        rather than listed, so has none.
         """
-        bz2_info_dirname = "info/"
-        if not any(f for f in self.members if f.startswith(bz2_info_dirname)):
-            raise ValueError(f"No info directory in {self.members=}")
-        return
+        if not self.is_zstd:
+            raise ValueError("Cannot list the members of a streamed .tar.bz2 archive")
+        return self.archive.filename_list
 
     def zst_meta_and_tarballs(self) -> tuple[str]:
         """
@@ -130,6 +112,27 @@ class CondaArchive:
     def info_fields(self) -> list[str]:
         return [self.path_info, self.about_info, self.index_info]
 
+    def read_zst(self, filename: str, paths: list[str]) -> list[bytes]:
+        """
+        Extract the bytes from the archive's internal tar.zst archive, downloading
+        only the byte range of the tarball (not the entire archive).
+
+        Args:
+          filename : Name of the tar.zst file within the archive
+          paths    : Paths within the tar.zst archive to return bytes from
+        """
+        return read_streamed_zst(self.archive, filename, paths)
+
+    def read_bz2(self, paths: list[str]) -> list[bytes]:
+        """
+        Extract the bytes from the .tar.bz2 archive, streaming it only as far as
+        the last of the paths (and raising `FileNotFoundError` if any is missing).
+
+        Args:
+          paths : Paths within the tar.bz2 archive to return bytes from
+        """
+        return read_bz2_paths(self.url, paths)
+
     def read_info(self):
         """
         Load the JSON files from the info archive (otherwise all attempts to
@@ -138,9 +141,9 @@ class CondaArchive:
         """
         if not self.info_is_read:
             if self.is_zstd:
-                info_b = read_zipped_zst(self.archive, self.info_zst, self.info_fields)
+                info_b = self.read_zst(filename=self.info_zst, paths=self.info_fields)
             else:
-                info_b = read_bz2_paths(self.archive, self.info_fields)
+                info_b = self.bz2_info
             self.path_json, self.about_json, self.index_json = map(json.load, info_b)
             self.info_is_read = True
 
@@ -160,8 +163,8 @@ class CondaArchive:
         pgen = (p["_path"] for p in self.path_json["paths"])
         libs = set()
         lib_name = None
-        ADD_LIB = False  # flag to direct control flow
         seen = set()
+        candidates = []  # path and top-level name of each possible package, in order
         for p in pgen:
             pth = Path(p)
             site_pkg_substr = "site-packages"
@@ -185,10 +188,16 @@ class CondaArchive:
                 continue  # crud that ends up in site-packages
             elif lib_name == "ez_setup.py" and self.package_name != "ez_setup":
                 continue  # installer shipped with some packages
+            candidates.append((p, lib_name))
+        # Extract all the shared libraries in one pass over the package tarball
+        so_paths = [p for p, name in candidates if Path(name).suffix == ".so"]
+        so_module_names = verify_exported_module_names(self, so_paths)
+        ADD_LIB = False  # flag to direct control flow
+        for p, lib_name in candidates:
             if "-" not in lib_name:
                 ADD_LIB = True  # non-`lib-dynload`, 'regular' package
-            if lib_name_path.suffix == ".so":  # macOS and Linux only
-                lib_name = verify_exported_module_name(conda_archive=self, so_path=p)
+            if Path(lib_name).suffix == ".so":  # macOS and Linux only
+                lib_name = so_module_names[p]
                 ADD_LIB = lib_name is not None
             if ADD_LIB:
                 if any(lib_name.endswith(s) for s in pkg_suffixes):
@@ -1,36 +1,48 @@
 from __future__ import annotations
 
-import subprocess
-from pathlib import Path
-from tempfile import TemporaryDirectory
+from sys import stderr
 
-# from .zip_utils import read_zipped_zst
+from .symbol_utils import exported_symbols
 
-__all__ = ["verify_exported_module_name"]
+__all__ = ["verify_exported_module_names"]
 
 
-def verify_exported_module_name(conda_archive, so_path: str) -> set[str] | None:
-    with TemporaryDirectory() as tmp_dir:
-        archive = conda_archive.archive  # access either .zip or .bz2 attribute
-        so_filename = Path(so_path).name
-        tmp_so = Path(tmp_dir) / so_filename
-        if conda_archive.is_zstd:
-            # the paths JSON is in the info zst, but the library is within the pkg zst
-            # `archive` is the outer zip: extract so_path from the pkg zst inside it
-            [so_bytes] = conda_archive.read_zst(conda_archive.pkg_zst, [so_path])
-            with open(tmp_so, "wb") as tf:
-                tf.write(so_bytes.read())
-        else:
-            archive.extract(so_path, path=tmp_dir)
-        cmd = ["nm", "-D", "--defined-only", tmp_so]
-        exported = subprocess.run(cmd, capture_output=True).stdout.decode().split("\n")
-        # NB: Python 2 used `init_` to prefix its exported func for module import name
-        py_funcs = [f for f in exported if "PyInit_" in f]
-        if py_funcs:
-            exported_module = {f.split("PyInit_")[1] for f in py_funcs}
-            if len(exported_module) > 1:
-                msg = f"{so_path=} exported multiple module names {exported_module=}"
-                raise ValueError(msg)
-            [exported_module_name] = exported_module
-            print(f"Verified {exported_module_name=}")
-            return exported_module_name
+def verify_exported_module_names(
+    conda_archive,
+    so_paths: list[str],
+) -> dict[str, str | None]:
+    """
+    Map each of the shared libraries at `so_paths` in the package to the name of
+    the module it exports (or `None` if it exports none), extracting them all in
+    one pass over the package tarball.
+    """
+    if not so_paths:
+        return {}
+    if conda_archive.is_zstd:
+        # the paths JSON is in the info zst, but the library is within the pkg zst
+        # `archive` is the outer zip: extract so_paths from the pkg zst inside it
+        so_files = conda_archive.read_zst(conda_archive.pkg_zst, so_paths)
+    else:
+        so_files = conda_archive.read_bz2(so_paths)
+    return {
+        so_path: exported_module_name(so_path, so_file.read())
+        for so_path, so_file in zip(so_paths, so_files)
+    }
+
+
+def exported_module_name(so_path: str, so_bytes: bytes) -> str | None:
+    try:
+        exported = exported_symbols(so_bytes)
+    except ValueError as e:
+        print(f"Could not read symbols of {so_path=}: {e}", file=stderr)
+        return None
+    # NB: Python 2 used `init_` to prefix its exported func for module import name
+    py_funcs = [f for f in exported if "PyInit_" in f]
+    if py_funcs:
+        exported_module = {f.split("PyInit_")[1] for f in py_funcs}
+        if len(exported_module) > 1:
+            msg = f"{so_path=} exported multiple module names {exported_module=}"
+            raise ValueError(msg)
+        [exported_module_name] = exported_module
+        print(f"Verified {exported_module_name=}")
+        return exported_module_name
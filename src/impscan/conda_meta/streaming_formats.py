@@ -5,19 +5,24 @@ import tarfile
 from pathlib import Path
 from sys import stderr
 
+from httpx import ConnectTimeout, ProtocolError, ReadTimeout
 from range_streams.codecs.conda import CondaStream
-from range_streams.codecs.zstd.tar import extract_zst
 
-from ..db.db_utils import CondaPackageDB
-from .so_utils import verify_exported_module_name
-from .tar_utils import open_tarfile_from_url, read_bz2_paths
+from ..db.db_utils import CondaPackageDB, CondaPackageWriter
+from .so_utils import verify_exported_module_names
+from .tar_utils import read_bz2_paths
 from .url_utils import (
     ArchiveType,
     detect_archive_type_from_url,
     detect_channel_from_url,
 )
+from .zip_utils import read_streamed_zst
 
-__all__ = ["CondaArchiveStream"]
+__all__ = ["CondaArchiveStream", "transient_errors"]
+
+# Network errors after which an archive is worth retrying (the connection may have
+# been terminated due to an httpx bug) rather than recorded as failed
+transient_errors = (ConnectTimeout, ProtocolError, ReadTimeout)
 
 
 class CondaArchiveStream:
@@ -28,6 +33,7 @@ class CondaArchiveStream:
     path_json = None
     about_json = None
     index_json = None
+    bz2_info = None  # .tar.bz2 info files, streamed when the archive is pulled
 
     def __init__(self, source_url: str, defer_pull: bool = True):
         self.url = source_url
@@ -42,28 +48,21 @@ class CondaArchiveStream:
             archive = CondaStream(url=self.url)
             self.zip = archive
         elif self.is_bz2:
+            # Stream only the info files (at the start of the tarball) for now
             try:
-                archive = open_tarfile_from_url(self.url)
+                self.bz2_info = self.read_bz2(self.info_fields)
             except tarfile.TarError:
-                print(f"Bad tarball: {url=}", file=stderr)
+                print(f"Bad tarball: {self.url=}", file=stderr)
                 raise
-            else:
-                assert isinstance(
-                    archive,
-                    tarfile.TarFile,
-                ), f"Unexpected {type(archive)=}"
-                self.bz2 = archive
         else:
             raise ValueError(f"{archive_type=} is not a valid ArchiveType")
         if self.archive_type is ArchiveType.Zstd:
-            # info_zst is used for info_bytes by read_zipped_zst
+            # info_zst is used for info_bytes by read_zst
             try:
                 self.meta_json, info_z, pkg_z = self.zst_meta_and_tarballs()
                 self.info_zst, self.pkg_zst = info_z, pkg_z
             except:
                 raise NotImplementedError  # breakpoint here
-        else:
-            self.check_bz2_info_dir()
 
     @property
     def is_zstd(self):
@@ -75,21 +74,17 @@ class CondaArchiveStream:
 
     @property
     def archive(self):
-        return self.zip if self.is_zstd else self.bz2
+        return self.zip if self.is_zstd else None  # .tar.bz2 members are streamed
 
     @property
     def members(self):
-        return self.archive.filename_list if self.is_zstd else self.archive.getnames()
-
-    def check_bz2_info_dir(self) -> None:
         """
-        Validate the members for assignment to instance attributes.
-        Note: 'members' means the filenames within the compressed .tar.bz2 archive.
+        The filenames within the .conda archive. A .tar.bz2 archive is streamed
+        rather than listed, so has none.
         """
-        bz2_info_dirname = "info/"
-        if not any(f for f in self.members if f.startswith(bz2_info_dirname)):
-            raise ValueError(f"No info directory in {self.members=}")
-        return
+        if not self.is_zstd:
+            raise ValueError("Cannot list the members of a streamed .tar.bz2 archive")
+        return self.archive.filename_list
 
     def zst_meta_and_tarballs(self) -> tuple[str]:
         """
@@ -133,14 +128,17 @@ class CondaArchiveStream:
           filename : Name of the tar.zst file within the CondaStream
           paths    : Paths within the tar.zst archive to return bytes from
         """
-        zf = next(f for f in self.archive.zipped_files if f.filename == filename)
-        zf_rng_start = zf.file_range.start
-        if zf.file_range not in self.archive.ranges:
-            self.archive.add(zf.file_range)
-        zf_response = self.archive.ranges[zf_rng_start]
-        zst_b = zf_response.read()
-        b = extract_zst(zst=zst_b, file_paths=paths)
-        return b
+        return read_streamed_zst(self.archive, filename, paths)
+
+    def read_bz2(self, paths: list[str]) -> list[bytes]:
+        """
+        Extract the bytes from the .tar.bz2 archive, streaming it only as far as
+        the last of the paths (and raising `FileNotFoundError` if any is missing).
+
+        Args:
+          paths : Paths within the tar.bz2 archive to return bytes from
+        """
+        return read_bz2_paths(self.url, paths)
 
     def read_info(self):
         """
@@ -152,7 +150,7 @@ class CondaArchiveStream:
             if self.is_zstd:
                 info_b = self.read_zst(filename=self.info_zst, paths=self.info_fields)
             else:
-                info_b = read_bz2_paths(self.archive, self.info_fields)
+                info_b = self.bz2_info
             self.path_json, self.about_json, self.index_json = map(json.load, info_b)
             self.info_is_read = True
 
@@ -172,8 +170,8 @@ class CondaArchiveStream:
         pgen = (p["_path"] for p in self.path_json["paths"])
         libs = set()
         lib_name = None
-        ADD_LIB = False  # flag to direct control flow
         seen = set()
+        candidates = []  # path and top-level name of each possible package, in order
         for p in pgen:
             pth = Path(p)
             site_pkg_substr = "site-packages"
@@ -197,10 +195,16 @@ class CondaArchiveStream:
                 continue  # crud that ends up in site-packages
             elif lib_name == "ez_setup.py" and self.package_name != "ez_setup":
                 continue  # installer shipped with some packages
+            candidates.append((p, lib_name))
+        # Extract all the shared libraries in one pass over the package tarball
+        so_paths = [p for p, name in candidates if Path(name).suffix == ".so"]
+        so_module_names = verify_exported_module_names(self, so_paths)
+        ADD_LIB = False  # flag to direct control flow
+        for p, lib_name in candidates:
             if "-" not in lib_name:
                 ADD_LIB = True  # non-`lib-dynload`, 'regular' package
-            if lib_name_path.suffix == ".so":  # macOS and Linux only
-                lib_name = verify_exported_module_name(conda_archive=self, so_path=p)
+            if Path(lib_name).suffix == ".so":  # macOS and Linux only
+                lib_name = so_module_names[p]
                 ADD_LIB = lib_name is not None
             if ADD_LIB:
                 if any(lib_name.endswith(s) for s in pkg_suffixes):
@@ -265,17 +269,37 @@ class CondaArchiveStream:
         }
         return db_entry
 
-    def inflate_archive(self, db: CondaPackageDB):
+    def read_db_entry(self) -> dict[str, str]:
+        """
+        Pull and parse the archive to a database entry (without writing to the
+        database, so this can be run on another thread).
+        """
+        self.pull()
+        return self.parse_to_db_entry()
+
+    def inflate_archive(self, db: CondaPackageDB | CondaPackageWriter):
         """
-        Pull and parse the archive to a database entry, and insert it.
+        Pull and parse the archive to a database entry, and insert it. If reading
+        the archive fails, this is recorded in the database instead, unless the
+        error is transient (one of `transient_errors`), which is raised to retry.
 
         Args:
-          db : The database to insert the entry into.
+          db : The database (or batch writer for it) to insert the entry into.
         """
         try:
-            self.pull()
-            e = self.parse_to_db_entry()
+            e = self.read_db_entry()
+        except transient_errors:
+            raise
+        except Exception as err:
+            # Safeguard archive parsing errors (so one bad archive does not stop
+            # the population), let DB errors raise
+            self.mark_failed(db, err)
+        else:
             db.insert_entry(**e)
-        except FileNotFoundError as err:
-            # Safeguard archive parsing errors, let DB errors raise
-            print(err, file=stderr)
+
+    def mark_failed(self, db: CondaPackageDB | CondaPackageWriter, err: Exception):
+        """
+        Report the error parsing the archive and record it in the database.
+        """
+        print(err, file=stderr)
+        db.mark_failed(self.url, repr(err))
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import struct
+
+__all__ = ["exported_symbols", "elf_dynamic_symbols", "macho_exported_symbols"]
+
+ELF_MAGIC = b"\x7fELF"
+SHT_DYNSYM = 11
+SHN_UNDEF = 0
+# Section header fields are in the same order for both classes, only their sizes vary
+ELF_SECTION_HEADER = {32: "IIIIIIIIII", 64: "IIQQQQIIQQ"}
+ELF_SYMBOL = {32: "IIIBBH", 64: "IBBHQQ"}  # (name, shndx) at (0, 5) and (0, 3)
+
+MACHO_MAGICS = {
+    b"\xce\xfa\xed\xfe": "<",  # 32-bit little-endian
+    b"\xcf\xfa\xed\xfe": "<",  # 64-bit little-endian
+    b"\xfe\xed\xfa\xce": ">",  # 32-bit big-endian
+    b"\xfe\xed\xfa\xcf": ">",  # 64-bit big-endian
+}
+FAT_MAGIC = b"\xca\xfe\xba\xbe"
+LC_SYMTAB = 0x2
+LC_DYLD_INFO = 0x22
+LC_DYLD_INFO_ONLY = 0x80000022
+LC_DYLD_EXPORTS_TRIE = 0x80000033
+N_EXT = 0x01
+N_TYPE = 0x0E
+N_UNDF = 0x0
+
+
+def exported_symbols(so_bytes: bytes) -> set[str]:
+    """
+    Return the names of the symbols defined and exported by the shared library
+    `so_bytes` (as `nm -D --defined-only` would list them), reading either an
+    ELF (Linux) or Mach-O (macOS) binary in memory. Raise `ValueError` if it is
+    neither, or is malformed.
+    """
+    try:
+        if so_bytes.startswith(ELF_MAGIC):
+            return elf_dynamic_symbols(so_bytes)
+        elif so_bytes[:4] in MACHO_MAGICS or so_bytes.startswith(FAT_MAGIC):
+            return macho_exported_symbols(so_bytes)
+    except (struct.error, IndexError, KeyError, UnicodeDecodeError) as e:
+        raise ValueError(f"Malformed shared library: {e}") from e
+    raise ValueError(f"Not an ELF or Mach-O binary (magic: {so_bytes[:4]!r})")
+
+
+def read_cstring(data: bytes, offset: int) -> str:
+    end = data.index(b"\0", offset)
+    return data[offset:end].decode()
+
+
+def elf_dynamic_symbols(elf: bytes) -> set[str]:
+    """
+    Return the names of the defined symbols in the `.dynsym` section of the ELF
+    binary `elf`, looked up in the string table it links to (`.dynstr`).
+    """
+    bits = {1: 32, 2: 64}[elf[4]]  # EI_CLASS
+    order = {1: "<", 2: ">"}[elf[5]]  # EI_DATA
+    if bits == 64:
+        (shoff,) = struct.unpack_from(f"{order}Q", elf, 0x28)
+        shentsize, shnum = struct.unpack_from(f"{order}HH", elf, 0x3A)
+    else:
+        (shoff,) = struct.unpack_from(f"{order}I", elf, 0x20)
+        shentsize, shnum = struct.unpack_from(f"{order}HH", elf, 0x2E)
+    sections = []
+    for i in range(shnum):
+        fields = struct.unpack_from(
+            order + ELF_SECTION_HEADER[bits],
+            elf,
+            shoff + i * shentsize,
+        )
+        _, sh_type, _, _, sh_offset, sh_size, sh_link, _, _, sh_entsize = fields
+        sections.append((sh_type, sh_offset, sh_size, sh_link, sh_entsize))
+    symbol = struct.Struct(order + ELF_SYMBOL[bits])
+    name_i, shndx_i = (0, 3) if bits == 64 else (0, 5)
+    symbols = set()
+    for sh_type, sh_offset, sh_size, sh_link, sh_entsize in sections:
+        if sh_type != SHT_DYNSYM:
+            continue
+        strtab_offset = sections[sh_link][1]
+        entsize = sh_entsize or symbol.size
+        for sym_offset in range(sh_offset, sh_offset + sh_size, entsize):
+            fields = symbol.unpack_from(elf, sym_offset)
+            st_name, st_shndx = fields[name_i], fields[shndx_i]
+            if st_name and st_shndx != SHN_UNDEF:
+                symbols.add(read_cstring(elf, strtab_offset + st_name))
+    return symbols
+
+
+def read_uleb128(data: bytes, offset: int) -> tuple[int, int]:
+    """
+    Decode the unsigned LEB128 integer at `offset` in `data`, returning it along
+    with the offset after it.
+    """
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if byte < 0x80:
+            return value, offset
+
+
+def macho_exported_symbols(macho: bytes) -> set[str]:
+    """
+    Return the names of the symbols exported by the Mach-O binary `macho` (the
+    first architecture if it is a universal binary), from its export trie, or
+    failing that the external defined symbols in its symbol table.
+    """
+    if macho.startswith(FAT_MAGIC):
+        # Fat header and arch entries are big-endian: take the first slice
+        (offset, size) = struct.unpack_from(">II", macho, 8 + 8)
+        macho = macho[offset : offset + size]
+    order = MACHO_MAGICS[macho[:4]]
+    is_64 = 0xCF in (macho[0], macho[3])  # 0xfeedfacf rather than 0xfeedface
+    (ncmds,) = struct.unpack_from(f"{order}I", macho, 16)
+    offset = 32 if is_64 else 28  # size of the Mach-O header
+    trie = symtab = None
+    for _ in range(ncmds):
+        cmd, cmdsize = struct.unpack_from(f"{order}II", macho, offset)
+        if cmd in (LC_DYLD_INFO, LC_DYLD_INFO_ONLY):
+            # rebase, bind, weak bind, and lazy bind (offset, size) precede export
+            trie = struct.unpack_from(f"{order}II", macho, offset + 40)
+        elif cmd == LC_DYLD_EXPORTS_TRIE:
+            trie = struct.unpack_from(f"{order}II", macho, offset + 8)
+        elif cmd == LC_SYMTAB:
+            symtab = struct.unpack_from(f"{order}IIII", macho, offset + 8)
+        offset += cmdsize
+    if trie is not None and trie[1]:
+        return read_export_trie(macho, *trie)
+    symbols = set()
+    if symtab is not None:
+        symoff, nsyms, stroff, _ = symtab
+        nlist = struct.Struct(order + ("IBBHQ" if is_64 else "IBBhI"))
+        for i in range(nsyms):
+            n_strx, n_type, *_ = nlist.unpack_from(macho, symoff + i * nlist.size)
+            if n_type & N_EXT and n_type & N_TYPE != N_UNDF:
+                symbols.add(read_cstring(macho, stroff + n_strx))
+    return symbols
+
+
+def read_export_trie(macho: bytes, trie_offset: int, trie_size: int) -> set[str]:
+    """
+    Return the symbol names in the export trie of `trie_size` bytes at
+    `trie_offset`, each being the concatenation of the edge labels on the path
+    from the root to a node with export info (a non-zero terminal size).
+    """
+    symbols = set()
+    to_visit = [(0, "")]
+    visited = set()
+    while to_visit:
+        node, prefix = to_visit.pop()
+        if node in visited or node >= trie_size:
+            continue  # malformed trie: don't loop or read outside it
+        visited.add(node)
+        terminal_size, offset = read_uleb128(macho, trie_offset + node)
+        if terminal_size:
+            symbols.add(prefix)
+        offset += terminal_size
+        n_children = macho[offset]
+        offset += 1
+        for _ in range(n_children):
+            label = read_cstring(macho, offset)
+            offset += len(label.encode()) + 1
+            child, offset = read_uleb128(macho, offset)
+            to_visit.append((child, prefix + label))
+    return symbols
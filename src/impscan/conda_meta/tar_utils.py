@@ -2,29 +2,54 @@ from __future__ import annotations
 
 import io
 import tarfile
+from collections.abc import Iterator
+from contextlib import contextmanager
 
-from .url_utils import read_raw_stream
+import requests
 
-__all__ = ["open_zipfile_from_url"]
+__all__ = ["open_tarfile_stream_from_url", "read_tar_stream_members", "read_bz2_paths"]
 
 
-def open_tarfile_from_url(url: str) -> tarfile.TarFile:
-    b = read_raw_stream(url)
-    z = tarfile.open(fileobj=io.BytesIO(b), mode="r:bz2")
-    return z
+@contextmanager
+def open_tarfile_stream_from_url(url: str) -> Iterator[tarfile.TarFile]:
+    """
+    Open the bz2 tarball at `url` as a stream, decompressing it as the response is
+    read. The download stops when the context is exited, however much is left.
+    """
+    with requests.get(url, stream=True) as response:
+        response.raise_for_status()
+        with tarfile.open(fileobj=response.raw, mode="r|bz2") as tf:
+            yield tf
+
+
+def read_tar_stream_members(
+    tf: tarfile.TarFile,
+    paths: list[str],
+) -> list[io.BytesIO]:
+    """
+    Given the TarFile `tf` (which may be opened in stream mode), read the members
+    at `paths` in the order they appear in the tarball, keeping only those and
+    stopping as soon as all are found. Return them in the order of `paths`.
+    """
+    wanted = set(paths)
+    found: dict[str, io.BytesIO] = {}
+    for member in tf:
+        if member.name in wanted and member.isfile():
+            found[member.name] = io.BytesIO(tf.extractfile(member).read())
+            if len(found) == len(wanted):
+                break
+    missing = [p for p in paths if p not in found]
+    if missing:
+        raise FileNotFoundError(f"Tar archive does not contain {missing}")
+    return [found[p] for p in paths]
 
 
-def read_bz2_paths(tf: tarfile.TarFile, bz2_paths: list[str]) -> list[bytes]:
+def read_bz2_paths(url: str, bz2_paths: list[str]) -> list[io.BytesIO]:
     """
-    Given the TarFile `tf`, and path(s) within the bz2 tarball
-    `bz2_paths`, return a list of one or more bytestrings from
-    decompressing those paths.
+    Given the URL of a bz2 tarball, and path(s) within it `bz2_paths`, return a
+    list of one or more file-like objects of those paths' decompressed bytes.
+    Only as much of the tarball is downloaded and decompressed as precedes the
+    last of them (conda-build puts the `info/` members first).
     """
-    bz2_files = tf.getnames()
-    r = []
-    for filename in bz2_paths:
-        # e.g. filename = "info/paths.json"
-        if filename not in bz2_files:
-            raise FileNotFoundError(f"Bz2 archive does not contain {filename}")
-        r.append(tf.extractfile(filename))
-    return r
+    with open_tarfile_stream_from_url(url) as tf:
+        return read_tar_stream_members(tf, bz2_paths)
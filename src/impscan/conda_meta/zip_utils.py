@@ -1,30 +1,29 @@
 from __future__ import annotations
 
 import io
-import zipfile
 
-from .url_utils import read_raw_stream
-from .zstd_utils import extract_zst
-
-__all__ = ["open_zipfile_from_url", "read_zipped_zst"]
+from range_streams.codecs.conda import CondaStream
 
+from .zstd_utils import extract_zst
 
-def open_zipfile_from_url(url: str) -> zipfile.ZipFile:
-    b = read_raw_stream(url)
-    z = zipfile.ZipFile(io.BytesIO(b))
-    return z
+__all__ = ["read_streamed_zst"]
 
 
-def read_zipped_zst(
-    zf: zipfile.ZipFile,
+def read_streamed_zst(
+    conda_stream: CondaStream,
     zst_tar_fn: str,
     zst_paths: list[str],
-) -> list[bytes]:
+) -> list[io.BytesIO]:
     """
-    Given the ZipFile `zf`, tarball filename `zst_tar_fn`, and path(s) within the
-    zst tarball `zst_paths`, return a list of one or more bytestrings from
-    decompressing those paths.
+    Given the CondaStream `conda_stream` (which only requests the zip central
+    directory up front), tarball filename `zst_tar_fn`, and path(s) within the
+    zst tarball `zst_paths`, return a list of one or more file-like objects of
+    the decompressed bytes of those paths. The tarball's byte range is streamed
+    only as far as the last of them, not the rest of the archive.
     """
-    bz = zf.read(zst_tar_fn)
-    b = extract_zst(bz, zst_paths)  # decompress bytes but do not read
-    return b
+    zf = next(f for f in conda_stream.zipped_files if f.filename == zst_tar_fn)
+    if zf.file_range not in conda_stream.ranges:
+        conda_stream.add(zf.file_range)
+    zf_response = conda_stream.ranges[zf.file_range.start]
+    zf_response.seek(0)  # in case the tarball was read before
+    return extract_zst(zf_response, zst_paths)
@@ -2,49 +2,27 @@ from __future__ import annotations
 
 import io
 import tarfile
+from typing import BinaryIO
 
 from pyzstd import ZstdFile
 
-__all__ = ["ZstdTarFile", "extract_zst"]
-
-
-class ZstdTarFile(tarfile.TarFile):
-    def __init__(
-        self,
-        name,
-        mode="r",
-        *,
-        level_or_option=None,
-        zstd_dict=None,
-        **kwargs,
-    ):
-        self.zstd_file = ZstdFile(
-            name,
-            mode,
-            level_or_option=level_or_option,
-            zstd_dict=zstd_dict,
-        )
-        try:
-            super().__init__(fileobj=self.zstd_file, mode=mode, **kwargs)
-        except:
-            self.zstd_file.close()
-            raise
-
-    def close(self):
-        super().close()
-        self.zstd_file.close()
-
-
-def extract_zst(zst: bytes, file_paths: list[str]) -> list[bytes]:
-    zstd_tar = ZstdTarFile(io.BytesIO(zst))
-    zstd_files = zstd_tar.getnames()
-    r = []
-    for filename in file_paths:
-        # e.g. filename = "info/paths.json"
-        if filename not in zstd_files:
-            raise FileNotFoundError(f"Zstd archive does not contain {filename}")
-        r.append(zstd_tar.extractfile(filename))
-    return r
+from .tar_utils import read_tar_stream_members
+
+__all__ = ["extract_zst"]
+
+
+def extract_zst(zst: bytes | BinaryIO, file_paths: list[str]) -> list[io.BytesIO]:
+    """
+    Given the zstd tarball `zst` (as bytes or a file-like object to stream it
+    from), return a list of one or more file-like objects of the decompressed
+    bytes of the `file_paths` within it. The tar headers are read in order and
+    only the members requested are kept, stopping as soon as all are found
+    (rather than decompressing the entire tarball to list its names first).
+    """
+    fileobj = io.BytesIO(zst) if isinstance(zst, bytes) else zst
+    with ZstdFile(fileobj) as zstd_file:
+        with tarfile.open(fileobj=zstd_file, mode="r|") as tf:
+            return read_tar_stream_members(tf, file_paths)
 
 
 #
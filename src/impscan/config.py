@@ -1,12 +1,27 @@
+from __future__ import annotations
+
 __all__ = ["EnvConfig"]
 
 
 class EnvConfig:
+    # Default values for settings not passed as keyword arguments
+    workers = 1  # Number of processes to scan files with (0 for all CPU cores)
+    cache = False  # Whether to cache the imports of each file between scans
+    python_version = None  # Target Python version (default: the running one)
+    stdlib_modules = None  # Explicit stdlib module names for the target Python
+    ignore_globs: list[str] = []  # Names to skip in addition to the defaults
+    gitignore = True  # Whether to skip paths ignored by .gitignore files
+    extractor = "ast"  # How to find imports: parsing ("ast") or scanning ("fast")
+    nested = False  # Whether to find imports below module level (e.g. in functions)
+    keep_files = True  # Whether to keep every file scanned (else just the imports)
+
     def __init__(self, **kwargs):
         self.settings = set()
         for k, v in kwargs.items():
             self.set_config(k, v)
 
     def set_config(self, setting, value):
+        if setting == "workers" and value < 0:
+            raise ValueError(f"{setting} must be 0 (for all CPU cores) or more")
         setattr(self, setting, value)
         self.settings.add(setting)
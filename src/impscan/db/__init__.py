@@ -1,6 +1,12 @@
 from .db_utils import PackageDB
 from .generate_db import CondaArchiveListings
+from .import_index import ImportIndex
 
 # from .generate_db_sync_streaming import populate_conda_package_db
 
-__all__ = ["PackageDB", "CondaArchiveListings"]  # , "populate_conda_package_db"]
+__all__ = [
+    "PackageDB",
+    "CondaArchiveListings",
+    "ImportIndex",
+    # "populate_conda_package_db",
+]
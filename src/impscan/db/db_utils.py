@@ -1,19 +1,60 @@
+from __future__ import annotations
+
 import sqlite3
+import time
+from collections.abc import Iterable
+from enum import Enum
 from sys import stderr
 
 from ..assets import _dir_path as store_path
+from .import_index import ImportIndex, write_import_index
+
+__all__ = [
+    "PackageDB",
+    "CondaPackageDB",
+    "CondaPackageWriter",
+    "PopulationStatus",
+]  # TODO: "PyPIPackageDB"
+
+# Settings for a long-lived writing connection: in WAL mode a commit appends to
+# the log rather than rewriting the DB, and need only be synced at checkpoints
+write_pragmas = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "temp_store": "MEMORY",
+    "cache_size": -64_000,  # KiB
+}
 
-__all__ = ["PackageDB", "CondaPackageDB"]  # TODO: "PyPIPackageDB"
+
+def has_table(conn: sqlite3.Connection, name: str) -> bool:
+    query_sql = "SELECT 1 FROM sqlite_master WHERE type == 'table' AND name == ?"
+    return conn.execute(query_sql, (name,)).fetchone() is not None
 
 
 class PackageDB:
     filename = "package_catalogue.db"  # Default value
     directory = store_path
 
-    def __init__(self, dir=directory, filename=filename, create=True, no_touch=False):
+    mmap_size = 2**30  # Maximum bytes of a read-only DB to memory-map
+
+    def __init__(
+        self,
+        dir=directory,
+        filename=filename,
+        create=True,
+        no_touch=False,
+        read_only=False,
+    ):
+        """
+        If `read_only`, the database is opened read-only and memory-mapped (so
+        that processes reading it concurrently share the OS page cache), and never
+        created. Entries written but not yet checkpointed from the write-ahead log
+        (e.g. during population) are still seen.
+        """
         self.directory = dir
         self.filename = filename
-        if create:
+        self.read_only = read_only
+        if create and not read_only:
             self.create(no_touch=no_touch)
 
     @property
@@ -24,7 +65,12 @@ class PackageDB:
         return self.path.exists()
 
     def connect(self):
-        return sqlite3.connect(self.path)
+        if not self.read_only:
+            return sqlite3.connect(self.path)
+        uri = f"{self.path.absolute().as_uri()}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True)
+        conn.execute(f"PRAGMA mmap_size = {self.mmap_size}")
+        return conn
 
     # This would also be useful for imported name when supplied
     def has_package(self, package_name):
@@ -36,10 +82,43 @@ class PackageDB:
         return f"{type(self)} '{self.filename}' at {self.directory}"
 
 
+class PopulationStatus(Enum):
+    Pending = "pending"  # To be inflated (not yet attempted)
+    Done = "done"  # Inserted into the `conda_packages` table
+    Failed = "failed"  # Attempted without success (to be retried)
+
+
+def imported_name_rows(impname: str | None, channel: str, fn: str) -> list[tuple]:
+    """
+    Split the comma-separated imported names of a package archive into rows of
+    the `imported_names` table.
+    """
+    return [(name, channel, fn) for name in (impname or "").split(",") if name]
+
+
 class CondaPackageDB(PackageDB):
+    insert_sql = "INSERT INTO conda_packages VALUES (?,?,?,?,?,?,?,?)"
+    insert_names_sql = "INSERT INTO imported_names VALUES (?,?,?)"
+    mark_done_sql = (
+        "UPDATE population_progress SET status = 'done', error = NULL WHERE url == ?"
+    )
+    mark_failed_sql = (
+        "UPDATE population_progress SET status = 'failed', error = ? WHERE url == ?"
+    )
+    entry_keys = [
+        "pkgname",
+        "impname",
+        "channel",
+        "depends",
+        "fn",
+        "url",
+        "version",
+        "rootpkgs",
+    ]
+
     def create(self, no_touch=False):
         if no_touch and not self.path.exists():
-            raise FileNotFoundError(f"No PackageDB at {self.db.path}")
+            raise FileNotFoundError(f"No PackageDB at {self.path}")
         with self.connect() as conn:
             c = conn.cursor()
             c.execute(
@@ -51,6 +130,39 @@ class CondaPackageDB(PackageDB):
                 Constraint pk_pid Primary key(channel, filename))
                 """,
             )
+            # Each imported name in `conda_packages.importedname` gets a row here,
+            # indexed by name (covering the columns that locate its package)
+            has_names_table = has_table(conn, "imported_names")
+            c.execute(
+                """
+                CREATE TABLE IF NOT EXISTS imported_names
+                (importedname varchar(100), channel tinytext, filename tinytext)
+                """,
+            )
+            c.execute(
+                """
+                CREATE INDEX IF NOT EXISTS ix_imported_names
+                ON imported_names (importedname, channel, filename)
+                """,
+            )
+            # The archives to populate the database from are checkpointed here,
+            # each marked done as it is inserted, so population can be resumed
+            c.execute(
+                """
+                CREATE TABLE IF NOT EXISTS population_progress
+                (url tinytext PRIMARY KEY, filename tinytext,
+                status varchar(10), error text)
+                """,
+            )
+            if not has_names_table:
+                # Fill in the names of any packages inserted before it existed
+                rows = c.execute(
+                    "SELECT importedname, channel, filename FROM conda_packages",
+                ).fetchall()
+                c.executemany(
+                    self.insert_names_sql,
+                    [n for row in rows for n in imported_name_rows(*row)],
+                )
 
     def insert_entry(
         self,
@@ -67,9 +179,14 @@ class CondaPackageDB(PackageDB):
             with self.connect() as conn:
                 c = conn.cursor()
                 c.execute(
-                    "INSERT INTO conda_packages VALUES (?,?,?,?,?,?,?,?)",
+                    self.insert_sql,
                     (pkgname, impname, channel, depends, fn, url, version, rootpkgs),
                 )
+                c.executemany(
+                    self.insert_names_sql,
+                    imported_name_rows(impname, channel, fn),
+                )
+                c.execute(self.mark_done_sql, (url,))
                 conn.commit()
         except:
             print(
@@ -79,6 +196,168 @@ class CondaPackageDB(PackageDB):
             )
             raise
 
+    def insert_entries(self, entries: Iterable[dict[str, str]]) -> None:
+        """
+        Insert many entries (dicts with the keyword arguments of `insert_entry`)
+        in a single transaction.
+        """
+        with self.batch_writer(batch_size=None) as writer:
+            writer.insert_entries(entries)
+
+    def mark_failed(self, url: str, error: str) -> None:
+        """
+        Record that inflating the archive at `url` failed (with the `error`).
+        """
+        with self.connect() as conn:
+            conn.execute(self.mark_failed_sql, (error, url))
+
+    def resume_population(
+        self,
+        urls: Iterable[str],
+        retry_failed: bool = True,
+    ) -> list[str]:
+        """
+        Record the archive `urls` to populate the database from as pending (unless
+        already recorded), and return those not yet done, in the order given.
+        Archives inserted without being recorded (e.g. before progress was) are
+        marked done. Those that failed before are included if `retry_failed`.
+        """
+        urls = list(dict.fromkeys(urls))
+        with self.connect() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO population_progress VALUES (?,?,'pending',NULL)",
+                [(url, url[url.rfind("/") + 1 :]) for url in urls],
+            )
+            conn.execute(
+                """
+                UPDATE population_progress SET status = 'done', error = NULL
+                WHERE status != 'done' AND url IN (SELECT url FROM conda_packages)
+                """,
+            )
+            statuses = dict(conn.execute("SELECT url, status FROM population_progress"))
+        to_do = [PopulationStatus.Pending]
+        if retry_failed:
+            to_do.append(PopulationStatus.Failed)
+        return [url for url in urls if PopulationStatus(statuses[url]) in to_do]
+
+    def prune_stale_archives(self, package_urls: dict[str, str]) -> list[str]:
+        """
+        Delete the archives that are not current, given `package_urls` mapping the
+        URL of the current archive of each listed package to its name, and return
+        their URLs. A package's old archives are only deleted once its current one
+        is in the database, unless it is no longer listed at all.
+        """
+        with self.connect() as conn:
+            conn.execute(
+                "CREATE TEMP TABLE current_archives (url text PRIMARY KEY, name text)",
+            )
+            conn.executemany(
+                "INSERT INTO current_archives VALUES (?,?)",
+                package_urls.items(),
+            )
+            stale = conn.execute(
+                """
+                SELECT channel, filename, url FROM conda_packages
+                WHERE url NOT IN (SELECT url FROM current_archives)
+                AND (
+                    packagename NOT IN (SELECT name FROM current_archives)
+                    OR packagename IN (
+                        SELECT packagename FROM conda_packages
+                        WHERE url IN (SELECT url FROM current_archives)
+                    )
+                )
+                """,
+            ).fetchall()
+            conn.execute("DROP TABLE current_archives")
+            for table in ["imported_names", "conda_packages"]:
+                conn.executemany(
+                    f"DELETE FROM {table} WHERE channel == ? AND filename == ?",
+                    [(channel, fn) for channel, fn, _ in stale],
+                )
+            conn.executemany(
+                "DELETE FROM population_progress WHERE url == ?",
+                [(url,) for *_, url in stale],
+            )
+        return [url for *_, url in stale]
+
+    def population_progress(self) -> dict[PopulationStatus, int]:
+        """
+        Count the archives recorded with each status.
+        """
+        with self.connect() as conn:
+            counts = conn.execute(
+                "SELECT status, COUNT(*) FROM population_progress GROUP BY status",
+            )
+            return {PopulationStatus(status): n for status, n in counts}
+
+    def batch_writer(self, **kwargs) -> CondaPackageWriter:
+        """
+        Return a writer that inserts entries into this database in batches (as a
+        context manager, so that the last batch is written on exiting it).
+        """
+        return CondaPackageWriter(db=self, **kwargs)
+
+    def lookup_imported_names(self, names: Iterable[str]) -> dict[str, list[tuple]]:
+        """
+        Map each of the imported `names` found in the database to a list of the
+        `(packagename, channel, filename)` of the package archives providing it,
+        in a single query.
+        """
+        names = list(set(names))
+        placeholders = ",".join("?" * len(names))
+        query_sql = f"""
+        SELECT n.importedname, p.packagename, n.channel, n.filename
+        FROM imported_names AS n
+        JOIN conda_packages AS p USING (channel, filename)
+        WHERE n.importedname IN ({placeholders})
+        ORDER BY n.importedname, n.channel, n.filename
+        """
+        resolved = {}
+        with self.connect() as conn:
+            if not has_table(conn, "imported_names"):
+                return self.lookup_unindexed_names(conn, names)
+            for name, *package in conn.execute(query_sql, names):
+                resolved.setdefault(name, []).append(tuple(package))
+        return resolved
+
+    def lookup_unindexed_names(
+        self,
+        conn: sqlite3.Connection,
+        names: list[str],
+    ) -> dict[str, list[tuple]]:
+        """
+        Look up the imported `names` as `lookup_imported_names` does, in a database
+        built before the `imported_names` table (which is only filled in when the
+        database is opened writable), by splitting each package's imported names.
+        """
+        wanted = set(names)
+        query_sql = """
+        SELECT importedname, packagename, channel, filename FROM conda_packages
+        ORDER BY channel, filename
+        """
+        resolved = {}
+        for impname, *package in conn.execute(query_sql):
+            for name, *_ in imported_name_rows(impname, *package[1:]):
+                if name in wanted:
+                    resolved.setdefault(name, []).append(tuple(package))
+        return dict(sorted(resolved.items()))
+
+    def export_import_index(self, index: ImportIndex | None = None) -> int:
+        """
+        Write the imported names of all the packages (with their package names
+        and channels) to an `ImportIndex` (by default, alongside the database),
+        returning the number of records in it. The index should be exported again
+        whenever the database is populated, as it is not updated otherwise.
+        """
+        index = index or ImportIndex(dir=self.directory)
+        query_sql = """
+        SELECT n.importedname, p.packagename, n.channel
+        FROM imported_names AS n
+        JOIN conda_packages AS p USING (channel, filename)
+        """
+        with self.connect() as conn:
+            return write_import_index(conn.execute(query_sql), index.path)
+
     def retrieve_filename(self, fn, fetch_all=False):
         with self.connect() as conn:
             query_sql = """
@@ -98,3 +377,114 @@ class CondaPackageDB(PackageDB):
             c = conn.cursor()
             c.execute(query_sql, (package_name,))
             return c.fetchall() if fetch_all else c.fetchone()
+
+
+class CondaPackageWriter:
+    """
+    Writer for a `CondaPackageDB` that buffers the entries passed to
+    `insert_entry` (which has the same signature as `CondaPackageDB.insert_entry`,
+    so it can be passed in place of the database) and inserts them on a single
+    long-lived connection, one transaction per batch. A batch is written when
+    `batch_size` entries are buffered, or an entry is added `flush_interval`
+    seconds after the last batch was, or the writer is closed. If `batch_size` is
+    `None`, the entries are only written when the writer is flushed or closed.
+    """
+
+    def __init__(
+        self,
+        db: CondaPackageDB,
+        batch_size: int | None = 500,
+        flush_interval: float = 5.0,
+    ):
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.conn: sqlite3.Connection | None = None
+        self.pending: list[tuple] = []
+        self.pending_names: list[tuple] = []  # rows of the `imported_names` table
+        self.pending_urls: list[tuple] = []  # to be marked done in the progress table
+        self.pending_failures: list[tuple] = []  # (error, url) of failed archives
+        self.last_flush = time.monotonic()
+        self.n_written = 0
+
+    def open(self) -> None:
+        self.conn = self.db.connect()
+        for pragma, value in write_pragmas.items():
+            self.conn.execute(f"PRAGMA {pragma} = {value}")
+
+    def close(self) -> None:
+        if self.conn is not None:
+            try:
+                self.flush()
+                self.leave_wal_mode()
+            finally:
+                self.conn.close()
+                self.conn = None
+
+    def leave_wal_mode(self) -> None:
+        """
+        Checkpoint the write-ahead log into the database and go back to the
+        default rollback journal, as WAL mode persists in the database file and a
+        WAL database cannot be opened read-only where its directory is not
+        writable (to create the shared memory file). This is skipped if another
+        connection is using the database, which will then be left in WAL mode.
+        """
+        try:
+            self.conn.execute("PRAGMA journal_mode = DELETE")
+        except sqlite3.OperationalError:
+            print("Database is busy, leaving it in WAL mode", file=stderr)
+
+    def __enter__(self) -> CondaPackageWriter:
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def insert_entry(self, **entry: str) -> None:
+        self.pending.append(tuple(entry[k] for k in self.db.entry_keys))
+        self.pending_names.extend(
+            imported_name_rows(entry["impname"], entry["channel"], entry["fn"]),
+        )
+        self.pending_urls.append((entry["url"],))
+        if self.batch_size is not None and (
+            len(self.pending) >= self.batch_size
+            or time.monotonic() - self.last_flush >= self.flush_interval
+        ):
+            self.flush()
+
+    def insert_entries(self, entries: Iterable[dict[str, str]]) -> None:
+        for entry in entries:
+            self.insert_entry(**entry)
+
+    def mark_failed(self, url: str, error: str) -> None:
+        """
+        Record that inflating the archive at `url` failed, with the next batch.
+        """
+        self.pending_failures.append((error, url))
+
+    def flush(self) -> None:
+        """
+        Write all the buffered entries in one transaction.
+        """
+        if self.pending or self.pending_failures:
+            try:
+                with self.conn as conn:  # commits, or rolls back if any insert fails
+                    conn.executemany(self.db.insert_sql, self.pending)
+                    conn.executemany(self.db.insert_names_sql, self.pending_names)
+                    conn.executemany(self.db.mark_done_sql, self.pending_urls)
+                    conn.executemany(self.db.mark_failed_sql, self.pending_failures)
+            except:
+                fns = [row[self.db.entry_keys.index("fn")] for row in self.pending]
+                print(f"Failed to write batch of entries {fns=}", file=stderr)
+                self.clear()  # not to be retried on closing
+                raise
+            self.n_written += len(self.pending)
+            self.clear()
+        self.last_flush = time.monotonic()
+
+    def clear(self) -> None:
+        self.pending.clear()
+        self.pending_names.clear()
+        self.pending_urls.clear()
+        self.pending_failures.clear()
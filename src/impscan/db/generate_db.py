@@ -1,9 +1,9 @@
 from __future__ import annotations
 
-import json
 from functools import partial
 from sys import stderr
-from collections.abc import Generator
+from collections.abc import Generator, Iterator
+from itertools import dropwhile
 
 from httpx import ConnectTimeout, ProtocolError
 
@@ -12,7 +12,8 @@ from ..conda_meta.async_utils import fetch_archives
 from ..conda_meta.formats import CondaArchive
 from ..share import batch_multiprocess_with_return
 from .db_utils import CondaPackageDB
-from .version_utils import sort_package_json_by_version
+from .listing_utils import iter_json_object_items
+from .version_utils import select_newest_archive
 
 __all__ = ["populate_conda_package_db"]
 
@@ -29,24 +30,24 @@ class CondaSearchJson:
         self.start_from_pkg = start_from_pkg
         if not self.path.exists():
             raise NotImplementedError  # TODO issue #13
-        with open(self.path) as f:
-            self.json = json.load(f)  # less than a GB in memory
-        # self.package_list = [*self.json][:10]
-        self.package_list = [k for k in self.json if k == "tqdm"]
-        if start_from_pkg:
-            pkg_start_i = self.package_list.index(start_from_pkg) - 1
-            self.package_list = self.package_list[pkg_start_i:]
+
+    def iter_listings(self) -> Iterator[tuple[str, list[dict]]]:
+        """
+        Yield each package in the listings with its list of builds, parsed one
+        package at a time rather than loading the entire listings into memory.
+        """
+        listings = iter_json_object_items(self.path)
+        # listings = islice(listings, 10)
+        listings = (item for item in listings if item[0] == "tqdm")
+        if self.start_from_pkg:
+            listings = dropwhile(lambda item: item[0] != self.start_from_pkg, listings)
+        return listings
 
     def generate_package_urls(self) -> Generator[str]:
-        for package in self.package_list:
+        for package, builds in self.iter_listings():
             # print(f"{package=}")
-            archive_listings = sort_package_json_by_version(self.json[package])
-            suffcheck = partial(check_listings_suffix, lst=archive_listings)
-            if any(suffcheck(suffix=".conda")):
-                most_recent_archive = next(suffcheck(suffix=".conda"))
-            elif any(suffcheck(suffix=".tar.bz2")):
-                most_recent_archive = next(suffcheck(suffix=".tar.bz2"))
-            else:
+            most_recent_archive = select_newest_archive(builds)
+            if most_recent_archive is None:
                 print(f"No .conda or .tar.bz2 archives for {package=}", file=stderr)
                 continue
             yield most_recent_archive["url"]
@@ -122,7 +123,3 @@ class CondaArchiveListings:
         )
         for s, b in zip(self.archives, all_scheduled_broadcasts):
             s.broadcasts = b
-
-
-def check_listings_suffix(lst: list[dict], suffix: str) -> Generator[dict]:
-    return (d for d in lst if d["fn"].endswith(suffix))
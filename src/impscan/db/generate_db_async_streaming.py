@@ -1,16 +1,17 @@
 from __future__ import annotations
 
-import json
 from functools import partial
 from sys import stderr
-from collections.abc import Generator
+from collections.abc import Generator, Iterable, Iterator
+from itertools import dropwhile
 
 
 from ..assets import _dir_path as store_path
 from ..conda_meta.async_utils_streaming import fetch_archives
 from ..conda_meta.streaming_formats import CondaArchiveStream
 from .db_utils import CondaPackageDB
-from .version_utils import sort_package_json_by_version
+from .listing_utils import iter_json_object_items
+from .version_utils import select_newest_archive
 
 __all__ = ["CondaSearchJson", "CondaArchiveListings"]
 
@@ -23,39 +24,71 @@ class CondaSearchJson:
     def path(self):
         return self.dir_path / self.filename
 
-    def __init__(self, start_from_pkg: str | None = None):
+    def __init__(
+        self,
+        start_from_pkg: str | None = None,
+        listings: Iterable[tuple[str, list[dict]]] | None = None,
+    ):
+        """
+        The `listings` of each package's builds are read from the conda search
+        results JSON file unless given (e.g. from `iter_repodata_listings`).
+        """
         self.start_from_pkg = start_from_pkg
-        if not self.path.exists():
+        self.listings = listings
+        self.package_urls = {}  # URL of each package's newest archive generated
+        if listings is None and not self.path.exists():
             raise NotImplementedError  # TODO issue #13
-        with open(self.path) as f:
-            self.json = json.load(f)  # less than a GB in memory
-        self.package_list = [*self.json]  # [:100]
-        # self.package_list = [k for k in self.json if k == "tqdm"]
-        if start_from_pkg:
-            pkg_start_i = self.package_list.index(start_from_pkg) - 1
-            self.package_list = self.package_list[pkg_start_i:]
+
+    def iter_listings(self) -> Iterator[tuple[str, list[dict]]]:
+        """
+        Yield each package in the listings with its list of builds, parsed one
+        package at a time rather than loading the entire listings into memory.
+        """
+        if self.listings is None:
+            listings = iter_json_object_items(self.path)
+        else:
+            listings = iter(self.listings)
+        # listings = islice(listings, 100)
+        # listings = (item for item in listings if item[0] == "tqdm")
+        if self.start_from_pkg:
+            listings = dropwhile(lambda item: item[0] != self.start_from_pkg, listings)
+        return listings
 
     def generate_package_urls(self) -> Generator[str]:
-        for package in self.package_list:
+        for package, builds in self.iter_listings():
             # print(f"{package=}")
-            archive_listings = sort_package_json_by_version(self.json[package])
-            suffcheck = partial(check_listings_suffix, lst=archive_listings)
-            if any(suffcheck(suffix=".conda")):
-                most_recent_archive = next(suffcheck(suffix=".conda"))
-            elif any(suffcheck(suffix=".tar.bz2")):
-                most_recent_archive = next(suffcheck(suffix=".tar.bz2"))
-            else:
+            most_recent_archive = select_newest_archive(builds)
+            if most_recent_archive is None:
                 print(f"No .conda or .tar.bz2 archives for {package=}", file=stderr)
                 continue
+            self.package_urls[most_recent_archive["url"]] = package
             yield most_recent_archive["url"]
 
 
 class CondaArchiveListings:
-    def __init__(self, start_from_pkg: str | None = None):
-        self.search_json = CondaSearchJson(start_from_pkg=start_from_pkg)
+    def __init__(
+        self,
+        start_from_pkg: str | None = None,
+        refresh: bool = False,
+        listings: Iterable[tuple[str, list[dict]]] | None = None,
+    ):
+        """
+        If `refresh` is True, archives that are no longer the newest listed for
+        their package are deleted from the database once the new ones are fetched.
+        The `listings` are passed to `CondaSearchJson`.
+        """
+        if refresh and start_from_pkg is not None:
+            raise ValueError("Cannot refresh from a partial listing (start_from_pkg)")
+        self.search_json = CondaSearchJson(
+            start_from_pkg=start_from_pkg,
+            listings=listings,
+        )
         self.db = CondaPackageDB()  # creates a new database if not existing
         self.archives = self.make_archives(defer_pull=True)
         self.fetch_archives()
+        if refresh:
+            self.db.prune_stale_archives(self.search_json.package_urls)
+        self.db.export_import_index()  # once pruned, to leave out stale archives
         # for a in self.archives:
         #    try:
         #        e = a.parse_to_db_entry()
@@ -80,18 +113,21 @@ class CondaArchiveListings:
         """
         Make and return a list of CondaArchiveStream objects and pull their
         URLs collectively in an efficient async procedure (not seriallly).
+        Archives already inserted into the database (by a previous, possibly
+        interrupted, run) are skipped.
         """
         return [
             self.make_archive(
                 source_url=url,
                 defer_pull=defer_pull,
             )
-            for url in self.urlset
+            for url in self.db.resume_population(self.urlset)
         ]
 
     def fetch_archives(self, verbose: bool = False, n_retries: int = 3):
         # (Retries due to httpx client bug documented in issue 6 of beeb issue tracker)
-        fetch_archives(archives=self.archives, db=self.db)
+        with self.db.batch_writer() as writer:
+            fetch_archives(archives=self.archives, db=writer, n_retries=n_retries)
         # self.inflate_all_archives(verbose=verbose)
 
     def inflate_all_archives(self, show_progress: bool = False):
@@ -104,7 +140,3 @@ class CondaArchiveListings:
             show_progress=show_progress,
             tqdm_desc="Inflating archives...",
         )
-
-
-def check_listings_suffix(lst: list[dict], suffix: str) -> Generator[dict]:
-    return (d for d in lst if d["fn"].endswith(suffix))
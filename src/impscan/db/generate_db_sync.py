@@ -1,13 +1,13 @@
 from __future__ import annotations
 
-import json
 import zipfile
 from sys import stderr
 
 from ..assets import _dir_path as store_path
 from ..conda_meta.formats import CondaArchive
 from .db_utils import CondaPackageDB
-from .version_utils import sort_package_json_by_version
+from .listing_utils import iter_json_object_items
+from .version_utils import select_newest_archive
 
 __all__ = ["populate_conda_package_db"]
 
@@ -17,33 +17,18 @@ def populate_conda_package_db(start_from_pkg: str | None = None):
     if not conda_search_json.exists():
         raise NotImplementedError
     db = CondaPackageDB()  # creates a new database if not existing
-    with open(conda_search_json) as f:
-        j = json.load(f)  # less than a GB in memory
-        for package in j:
-            if start_from_pkg is not None and package != start_from_pkg:
-                continue
-            start_from_pkg = None  # unset once initialised
-            print(f"{package=}")
-            archive_listings = sort_package_json_by_version(j[package])
-            if any(a for a in archive_listings if a["fn"].endswith(".conda")):
-                most_recent_archive = next(
-                    a for a in archive_listings if a["fn"].endswith(".conda")
-                )
-                c = CondaArchive(most_recent_archive["url"])
-                try:
-                    e = c.parse_to_db_entry()
-                    db.insert_entry(*e)
-                except (FileNotFoundError, zipfile.BadZipFile) as e:
-                    print(e, file=stderr)
-            elif any(a for a in archive_listings if a["fn"].endswith(".tar.bz2")):
-                most_recent_archive = next(
-                    a for a in archive_listings if a["fn"].endswith(".tar.bz2")
-                )
-                c = CondaArchive(most_recent_archive["url"])
-                try:
-                    e = c.parse_to_db_entry()
-                    db.insert_entry(*e)
-                except (FileNotFoundError, zipfile.BadZipFile) as e:
-                    print(e, file=stderr)
-            else:
-                print(ValueError(f"No .conda or .tar.bz2 archives for {package=}"))
+    for package, builds in iter_json_object_items(conda_search_json):
+        if start_from_pkg is not None and package != start_from_pkg:
+            continue
+        start_from_pkg = None  # unset once initialised
+        print(f"{package=}")
+        most_recent_archive = select_newest_archive(builds)
+        if most_recent_archive is None:
+            print(ValueError(f"No .conda or .tar.bz2 archives for {package=}"))
+            continue
+        c = CondaArchive(most_recent_archive["url"])
+        try:
+            e = c.parse_to_db_entry()
+            db.insert_entry(*e)
+        except (FileNotFoundError, zipfile.BadZipFile) as e:
+            print(e, file=stderr)
@@ -1,56 +1,76 @@
 from __future__ import annotations
 
-import json
+from collections.abc import Iterable
 from sys import stderr
 
-from httpx import ConnectTimeout, ProtocolError, ReadTimeout
-
 from ..assets import _dir_path as store_path
-from ..conda_meta.streaming_formats import CondaArchiveStream
+from ..conda_meta.streaming_formats import CondaArchiveStream, transient_errors
 from .db_utils import CondaPackageDB
-from .version_utils import sort_package_json_by_version
+from .listing_utils import iter_json_object_items
+from .version_utils import select_newest_archive
 
 __all__ = ["populate_conda_package_db"]
 
 
-def populate_conda_package_db(start_from_pkg: str | None = None, n_retries: int = 3):
-    conda_search_json = store_path / "conda_listings.json"
-    if not conda_search_json.exists():
-        raise NotImplementedError
+def populate_conda_package_db(
+    start_from_pkg: str | None = None,
+    n_retries: int = 3,
+    retry_failed: bool = True,
+    refresh: bool = False,
+    listings: Iterable[tuple[str, list[dict]]] | None = None,
+):
+    """
+    Insert the newest archive of each package in the conda listings into the
+    database. Progress is recorded in the database as archives are inserted, so
+    an interrupted run can be resumed by running again: archives already inserted
+    are skipped, and those that failed are retried (unless `retry_failed` is
+    False). Listings before the `start_from_pkg` package are skipped if given.
+
+    If `refresh` is True, archives that are no longer the newest listed for their
+    package (or whose package is no longer listed) are deleted afterwards, so that
+    refreshing an existing database only fetches the archives that changed.
+
+    The `listings` of each package's builds are read from the conda search results
+    JSON file unless given (e.g. from `iter_repodata_listings`).
+    """
+    if refresh and start_from_pkg is not None:
+        raise ValueError("Cannot refresh from a partial listing (start_from_pkg)")
+    if listings is None:
+        conda_search_json = store_path / "conda_listings.json"
+        if not conda_search_json.exists():
+            raise NotImplementedError
+        listings = iter_json_object_items(conda_search_json)
     db = CondaPackageDB()  # creates a new database if not existing
-    with open(conda_search_json) as f:
-        j = json.load(f)  # less than a GB in memory
-        for package in j:
-            if start_from_pkg is not None and package != start_from_pkg:
-                continue
-            start_from_pkg = None  # unset once initialised
-            print(f"{package=}")
-            archive_listings = sort_package_json_by_version(j[package])
-            if any(a for a in archive_listings if a["fn"].endswith(".conda")):
-                ext = ".conda"
-            elif any(a for a in archive_listings if a["fn"].endswith(".tar.bz2")):
-                ext = ".tar.bz2"
-            else:
-                print(ValueError(f"No .conda or .tar.bz2 archives for {package=}"))
-                continue
-            # Guaranteed to succeed without StopIteration due to above checks
-            most_recent_archive = next(
-                a for a in archive_listings if a["fn"].endswith(ext)
-            )
-            c = CondaArchiveStream(most_recent_archive["url"])
+    package_urls = {}
+    for package, builds in listings:
+        if start_from_pkg is not None and package != start_from_pkg:
+            continue
+        start_from_pkg = None  # unset once initialised
+        most_recent_archive = select_newest_archive(builds)
+        if most_recent_archive is None:
+            print(ValueError(f"No .conda or .tar.bz2 archives for {package=}"))
+            continue
+        package_urls[most_recent_archive["url"]] = package
+    urls = db.resume_population(package_urls, retry_failed=retry_failed)
+    print(f"{len(urls)}/{len(package_urls)} archives to inflate")
+    with db.batch_writer() as writer:
+        for url in urls:
+            print(f"package={package_urls[url]!r}")
+            c = CondaArchiveStream(url)
             # print(f"Inflating...")
             for i in range(n_retries):
                 try:
-                    c.inflate_archive(db=db)
-                except (
-                    ConnectTimeout,
-                    ProtocolError,
-                    ReadTimeout,
-                ) as e:  # ProtocolError as e:
+                    c.inflate_archive(db=writer)
+                except transient_errors as e:
                     print(f"- - - Error occurred {e}, retrying", file=stderr)
                     if i == n_retries - 1:
-                        raise  # Persisted after all retries, so throw it, don't proceed
+                        # Persisted after all retries, so record it to retry next run
+                        writer.mark_failed(url, repr(e))
                     # Otherwise retry, connection was terminated due to httpx bug
                 else:
                     break  # exit the for loop if it succeeds
             del c
+    if refresh:
+        stale_urls = db.prune_stale_archives(package_urls)
+        print(f"Deleted {len(stale_urls)} archives no longer current")
+    db.export_import_index()
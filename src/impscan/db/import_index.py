@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+from collections.abc import Iterable
+from pathlib import Path
+
+from ..assets import _dir_path as store_path
+
+__all__ = ["ImportIndex", "write_import_index"]
+
+# File layout: the magic bytes, the number of records `n`, then `n + 1` offsets
+# (of each record and the end of the last) into the records that follow them,
+# each being `importedname\0packagename\0channel` in UTF-8, sorted bytewise
+MAGIC = b"IMPIDX01"
+COUNT = struct.Struct("<I")
+OFFSET = struct.Struct("<I")
+
+
+def write_import_index(records: Iterable[tuple[str, str, str]], path: Path) -> int:
+    """
+    Write the `(importedname, packagename, channel)` records to an index file at
+    `path` (replacing any existing one only once it is complete). Return the
+    number of records written.
+    """
+    encoded = sorted({"\0".join(record).encode() for record in records})
+    offsets = [0]
+    for record in encoded:
+        offsets.append(offsets[-1] + len(record))
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(COUNT.pack(len(encoded)))
+        f.write(b"".join(map(OFFSET.pack, offsets)))
+        f.write(b"".join(encoded))
+    os.replace(tmp_path, path)
+    return len(encoded)
+
+
+class ImportIndex:
+    """
+    A compact index from imported name to the conda packages providing it (and
+    their channels), exported from the package catalogue. It is memory-mapped
+    and binary searched in place, so opening it reads nothing up front.
+    """
+
+    filename = "import_index.bin"  # Default value
+    directory = store_path
+
+    def __init__(self, dir=directory, filename=filename):
+        self.directory = dir
+        self.filename = filename
+        self.mm: mmap.mmap | None = None
+
+    @property
+    def path(self) -> Path:
+        return self.directory / self.filename
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def open(self) -> None:
+        with open(self.path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.mm[: len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{self.path} is not an import index")
+        (self.n_records,) = COUNT.unpack_from(self.mm, len(MAGIC))
+        self.offsets_start = len(MAGIC) + COUNT.size
+        self.records_start = self.offsets_start + (self.n_records + 1) * OFFSET.size
+
+    def close(self) -> None:
+        if self.mm is not None:
+            self.mm.close()
+            self.mm = None
+
+    def __enter__(self) -> ImportIndex:
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.n_records
+
+    def record(self, i: int) -> bytes:
+        start, end = struct.unpack_from(
+            "<2I",
+            self.mm,
+            self.offsets_start + i * OFFSET.size,
+        )
+        return self.mm[self.records_start + start : self.records_start + end]
+
+    def lookup(self, name: str) -> list[tuple[str, str]]:
+        """
+        Return the `(packagename, channel)` of each package providing `name`.
+        """
+        key = name.encode() + b"\0"
+        lo, hi = 0, self.n_records
+        while lo < hi:  # find the first record not sorted before the key
+            mid = (lo + hi) // 2
+            if self.record(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        packages = []
+        for i in range(lo, self.n_records):
+            record = self.record(i)
+            if not record.startswith(key):
+                break
+            package_name, channel = record[len(key) :].decode().split("\0")
+            packages.append((package_name, channel))
+        return packages
+
+    def lookup_imported_names(
+        self,
+        names: Iterable[str],
+    ) -> dict[str, list[tuple[str, str]]]:
+        """
+        Map each of the imported `names` in the index to a list of the
+        `(packagename, channel)` of the packages providing it.
+        """
+        resolved = {name: self.lookup(name) for name in set(names)}
+        return {name: packages for name, packages in resolved.items() if packages}
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import json
+from collections.abc import Iterator
+from pathlib import Path
+
+import httpx
+import pyzstd
+
+__all__ = ["iter_json_object_items", "read_repodata", "iter_repodata_listings"]
+
+decoder = json.JSONDecoder()
+whitespace = " \t\n\r"
+
+# The channels listed by `assets/store_conda_search_results.sh`, as download URLs
+default_channel_urls = [
+    "https://repo.anaconda.com/pkgs/main",
+    "https://conda.anaconda.org/conda-forge",
+]
+default_subdirs = ["noarch", "linux-64"]
+repodata_filenames = ["repodata.json.zst", "repodata.json"]  # in order of preference
+build_keys = ["name", "version", "build", "build_number", "subdir"]
+
+
+def iter_json_object_items(
+    path: Path,
+    chunk_size: int = 2**20,
+) -> Iterator[tuple[str, object]]:
+    """
+    Yield the key-value pairs of the JSON object in the file at `path` one at a
+    time, reading it in chunks of `chunk_size` characters, so that only one value
+    (e.g. the list of builds of one package in the conda listings) is in memory at
+    once rather than the entire object.
+    """
+    with open(path) as f:
+        buf = ""
+        eof = False
+
+        def read_more(size: int = chunk_size) -> None:
+            nonlocal buf, eof
+            chunk = f.read(size)
+            eof = not chunk
+            buf += chunk
+
+        def skip_to_token(pos: int) -> int:
+            """
+            Skip whitespace from `pos`, reading more if it runs out before a token.
+            """
+            while True:
+                while pos < len(buf) and buf[pos] in whitespace:
+                    pos += 1
+                if pos < len(buf) or eof:
+                    return pos
+                read_more()
+
+        def decode_at(pos: int) -> tuple[object, int]:
+            """
+            Decode the JSON value at `pos`, reading more until it is complete.
+            """
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                else:
+                    if end < len(buf) or eof:
+                        return value, end
+                    # Otherwise a number (or literal) may continue in the next chunk
+                # Read as much again as is buffered, so a long value is decoded in
+                # a number of attempts logarithmic in its length
+                read_more(max(chunk_size, len(buf)))
+
+        pos = skip_to_token(0)
+        if buf[pos : pos + 1] != "{":
+            raise ValueError(f"{path} does not contain a JSON object")
+        pos = skip_to_token(pos + 1)
+        if buf[pos : pos + 1] == "}":
+            return
+        while True:
+            key, pos = decode_at(pos)
+            pos = skip_to_token(pos)
+            if buf[pos : pos + 1] != ":":
+                raise ValueError(f"Expected ':' after {key=} in {path}")
+            value, pos = decode_at(skip_to_token(pos + 1))
+            yield key, value
+            buf, pos = buf[pos:], 0  # Discard the pair decoded
+            pos = skip_to_token(pos)
+            separator = buf[pos : pos + 1]
+            if separator == "}":
+                return
+            elif separator != ",":
+                raise ValueError(f"Expected ',' or '}}' after {key=} in {path}")
+            pos = skip_to_token(pos + 1)
+
+
+def read_repodata(location: str | Path, subdir: str) -> dict:
+    """
+    Read the repodata of a channel's `subdir` from its `location`, which may be
+    the channel URL (or a mirror of it) or a local directory laid out the same,
+    preferring the zstd-compressed `repodata.json.zst` if it exists.
+    """
+    for filename in repodata_filenames:
+        if isinstance(location, Path) or "://" not in location:
+            repodata_path = Path(location, subdir, filename)
+            if not repodata_path.exists():
+                continue
+            data = repodata_path.read_bytes()
+        else:
+            url = f"{location}/{subdir}/{filename}"
+            response = httpx.get(url, follow_redirects=True)
+            if response.status_code == 404:
+                continue
+            data = response.raise_for_status().content
+        if filename.endswith(".zst"):
+            data = pyzstd.decompress(data)
+        return json.loads(data)
+    raise FileNotFoundError(f"No repodata for {subdir=} at {location}")
+
+
+def iter_repodata_listings(
+    channels: dict[str, str | Path] | None = None,
+    subdirs: list[str] = default_subdirs,
+) -> Iterator[tuple[str, list[dict]]]:
+    """
+    Yield each package in the repodata of the `subdirs` of the `channels` (in
+    name order) with its list of builds, in the format of the conda listings
+    (`conda search --info --json`) as far as is needed to select the archive URL.
+
+    The `channels` map each channel's URL (to download archives from) to the
+    location to read its repodata from (see `read_repodata`), by default the
+    anaconda and conda-forge channels, each read from its own URL.
+    """
+    if channels is None:
+        channels = {url: url for url in default_channel_urls}
+    listings: dict[str, list[dict]] = {}
+    for channel_url, location in channels.items():
+        for subdir in subdirs:
+            repodata = read_repodata(location, subdir)
+            for key in ["packages", "packages.conda"]:
+                for fn, record in repodata.get(key, {}).items():
+                    build = {k: record[k] for k in build_keys if k in record}
+                    url = f"{channel_url}/{subdir}/{fn}"
+                    build.update(fn=fn, url=url, subdir=subdir)
+                    listings.setdefault(record["name"], []).append(build)
+            del repodata  # Only the builds' fields needed are kept
+    for package in sorted(listings):
+        yield package, listings.pop(package)
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-__all__ = ["sort_package_json_by_version"]
+__all__ = ["sort_package_json_by_version", "select_newest_archive"]
 
 
 def strip_ver_alpha_chars(version_str: str) -> str:
@@ -62,3 +62,36 @@ def sort_package_json_by_version(j: list[dict]) -> list[dict]:
         ),
         reverse=True,
     )
+
+
+archive_suffixes = [".conda", ".tar.bz2"]  # In order of preference
+
+
+def select_newest_archive(j: list[dict]) -> dict | None:
+    """
+    Select the newest build in `j` (as sorted by `sort_package_json_by_version`)
+    with a `.conda` archive, or failing that with a `.tar.bz2` archive, in a single
+    pass computing each distinct version's key once. Ties go to the first listed,
+    as for the (stable) sort. Return `None` if there are no builds with either.
+    """
+    has_epoch = any(d for d in j if "!" in d["version"])
+    version_tuples: dict[str, tuple] = {}  # Many builds share each version
+    newest: dict[str, tuple[tuple, dict]] = {}  # key and build for each suffix
+    for d in j:
+        fn = d["fn"]
+        if fn.endswith(".conda"):
+            suffix = ".conda"
+        elif fn.endswith(".tar.bz2"):
+            suffix = ".tar.bz2"
+        else:
+            continue
+        version = d["version"]
+        if version not in version_tuples:
+            version_tuples[version] = version_as_tuple(version, imply_epoch=has_epoch)
+        key = (version_tuples[version], d["build"])
+        if suffix not in newest or key > newest[suffix][0]:
+            newest[suffix] = (key, d)
+    for suffix in archive_suffixes:
+        if suffix in newest:
+            return newest[suffix][1]
+    return None
@@ -1,11 +1,50 @@
 # type: ignore
-__all__ = ["conda_search_reqs"]
+from __future__ import annotations
+
+from ..db.db_utils import CondaPackageDB
+from ..db.import_index import ImportIndex
+from .req_spec import CondaReqSpec
 
+__all__ = ["conda_search_reqs"]
 
-def conda_search_reqs(requirements) -> set:
-    conda_reqs = set()
 
-    for req in requirements.registered_imports:
-        # look up req (imported module name) in database compiled in advance
-        pass
-    return conda_reqs
+def conda_search_reqs(
+    requirements,
+    db: CondaPackageDB | None = None,
+    index: ImportIndex | None = None,
+) -> dict[str, list[CondaReqSpec]]:
+    """
+    Look up the conda packages providing the `registered_imports` of the
+    `requirements` all at once, grouped by channel. They are looked up in the
+    import `index` exported from the package catalogue if given (or if neither it
+    nor a `db` is given and the default index exists), otherwise in the catalogue
+    itself (opened read-only so it is not created if missing).
+    """
+    names = requirements.registered_imports
+    if index is None and db is None and ImportIndex().exists():
+        index = ImportIndex()
+    if not names:
+        return {}
+    elif index is not None:
+        with index:
+            resolved = index.lookup_imported_names(names)
+    else:
+        if db is None:
+            db = CondaPackageDB(read_only=True)
+        if not db.exists():
+            return {}
+        resolved = {
+            name: [(package_name, channel) for package_name, channel, _ in packages]
+            for name, packages in db.lookup_imported_names(names).items()
+        }
+    channel_packages: dict[str, set[str]] = {}
+    for packages in resolved.values():
+        for package_name, channel in packages:
+            channel_packages.setdefault(channel, set()).add(package_name)
+    return {
+        channel: [
+            CondaReqSpec(package=package_name, channel=[channel], constraints=[])
+            for package_name in sorted(package_names)
+        ]
+        for channel, package_names in sorted(channel_packages.items())
+    }
@@ -3,10 +3,12 @@ from . import (
     ast_utils,
     build_utils,
     import_utils,
+    line_utils,
     module_utils,
     requirement,
     sanitiser,
     scan,
+    scan_cache,
 )
 
 __all__ = [
@@ -14,8 +16,10 @@ __all__ = [
     "ast_utils",
     "build_utils",
     "import_utils",
+    "line_utils",
     "module_utils",
     "requirement",
     "sanitiser",
     "scan",
+    "scan_cache",
 ]
@@ -1,3 +1,5 @@
+from __future__ import annotations
+
 from pathlib import Path
 
 from ..config import EnvConfig
@@ -7,9 +9,17 @@ __all__ = ["ParsedPy"]
 
 
 class ParsedPy:
-    def __init__(self, py_file_path: Path, env_config: EnvConfig):
+    def __init__(
+        self,
+        py_file_path: Path,
+        env_config: EnvConfig,
+        imports: set | None = None,
+    ):
         self.path = py_file_path
-        self.ast_parse()  # set `imports` attribute
+        if imports is None:
+            self.ast_parse()  # set `imports` attribute
+        else:
+            self.imports = imports  # already parsed (e.g. in a worker process)
         self.env_config = env_config
 
     @property
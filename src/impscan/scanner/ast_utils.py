@@ -1,11 +1,113 @@
+from __future__ import annotations
+
 import ast
+import io
+import tokenize
+from collections.abc import Iterable
 from pathlib import Path
 
 import chardet
 
-from .import_utils import get_imported_name_sources, get_sibling_module_names
+from .import_utils import (
+    ImportContext,
+    exclude_sibling_module_names,
+    get_imported_name_contexts,
+    get_imported_names,
+)
+from .line_utils import scan_imported_names
+from .module_utils import stdlib_module_names
+
+__all__ = [
+    "decode_source",
+    "parse_imported_names",
+    "read_imported_names",
+    "filter_imported_names",
+    "retrieve_imported_modules",
+    "extractors",
+]
 
-__all__ = ["retrieve_imported_modules"]
+extractors = ["ast", "fast"]  # Ways to extract import statements from a file
+top_level_only = frozenset({ImportContext.TopLevel})
+
+
+def decode_source(fb: bytes) -> tuple[str, bool]:
+    """
+    Decode the bytes of a Python source file as the interpreter would (PEP 263):
+    by its BOM or coding cookie if it has one, otherwise as UTF-8. Only if that
+    fails is the encoding detected with chardet (which is slow on large files).
+
+    Return the decoded source and whether the chardet fallback was needed.
+    """
+    try:
+        encoding, _ = tokenize.detect_encoding(io.BytesIO(fb).readline)
+        return fb.decode(encoding), False
+    except (SyntaxError, UnicodeDecodeError):
+        pass  # invalid or unknown cookie, or not UTF-8
+    # UTF-8 is known to fail now, so take chardet's best guess however unsure
+    fe = chardet.detect(fb)["encoding"]
+    if fe is None:
+        fc = fb.decode()  # raises the UnicodeDecodeError (do not intercept for now)
+    else:
+        fc = fb.decode(encoding=fe)
+    return fc, True
+
+
+def parse_imported_names(
+    py_file_path: Path,
+    extractor: str = "ast",
+    nested: bool = False,
+) -> tuple[dict[str, frozenset[ImportContext]], bool]:
+    """
+    Return all imported names (including stdlib modules), mapped to the contexts
+    they are imported in, by parsing the AST for import statements (ignoring
+    relative imports), and whether decoding the file needed the chardet fallback.
+
+    Only module-level imports are found unless `nested` is True, in which case
+    imports anywhere in the module are (see `ImportVisitor`). Otherwise, if
+    `extractor` is "fast", the import statements are first scanned for without
+    parsing (see `scan_imported_names`), parsing only if that is ambiguous.
+    This gives the same names for valid Python, several times faster.
+    """
+    if extractor not in extractors:
+        raise ValueError(f"{extractor=} is not one of {extractors}")
+    fc, used_fallback = decode_source(py_file_path.read_bytes())
+    if nested:
+        name_contexts = get_imported_name_contexts(ast.parse(fc))
+        return {n: frozenset(c) for n, c in name_contexts.items()}, used_fallback
+    imported_names = scan_imported_names(fc) if extractor == "fast" else None
+    if imported_names is None:
+        trunk = ast.parse(fc).body
+        imported_names = get_imported_names(trunk)
+    return dict.fromkeys(imported_names, top_level_only), used_fallback
+
+
+def read_imported_names(py_file_path: Path) -> set:
+    """
+    Return a set of all imported names (including stdlib modules) by
+    parsing the AST for import statements (ignoring relative imports).
+    """
+    name_contexts, _ = parse_imported_names(py_file_path)
+    return set(name_contexts)
+
+
+def filter_imported_names(
+    imported_names: Iterable[str],
+    py_file_path: Path,
+    stdlib_modules: set | None = None,
+    sibling_cache: dict | None = None,
+) -> set:
+    """
+    Exclude stdlib modules (computed unless `stdlib_modules` is given) and the
+    names of modules alongside `py_file_path` from its `imported_names`. Pass a
+    `sibling_cache` dict to list each directory only once across many files.
+    """
+    if stdlib_modules is None:
+        stdlib_modules = stdlib_module_names()
+    return exclude_sibling_module_names(
+        {name for name in imported_names if name not in stdlib_modules},
+        py_file_path,
+        sibling_cache,
+    )
 
 
 def retrieve_imported_modules(py_file_path: Path) -> set:
@@ -13,21 +115,5 @@ def retrieve_imported_modules(py_file_path: Path) -> set:
     Return a set of imported names (excluding stdlib modules) by
     parsing the AST for import statements (ignoring relative imports).
     """
-    fb = py_file_path.read_bytes()
-    fd = chardet.detect(fb)
-    fe = fd["encoding"]
-    dconf = fd["confidence"]
-    try:
-        if dconf < 0.5:
-            fc = fb.decode()
-        else:
-            fc = fb.decode(encoding=fe)
-        trunk = ast.parse(fc).body
-    except Exception as e:
-        raise e  # do not intercept for now
-    module_sibling_names = get_sibling_module_names(py_file_path)
-    trunk_imports = get_imported_name_sources(trunk)
-    imported_names = {
-        name for name in trunk_imports if name not in module_sibling_names
-    }
-    return imported_names
+    imported_names = read_imported_names(py_file_path)
+    return filter_imported_names(imported_names, py_file_path)
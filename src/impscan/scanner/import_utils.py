@@ -1,16 +1,33 @@
 # type: ignore
+from __future__ import annotations
+
+import os
+from ast import Attribute, Module, Name, NodeVisitor, Tuple
 from ast import Import as IType
 from ast import ImportFrom as IFType
+from enum import Enum
 from pathlib import Path
 
 from .module_utils import stdlib_module_names
 
-__all__ = ["get_imported_name_sources", "get_sibling_module_names"]
+__all__ = [
+    "ImportContext",
+    "ImportVisitor",
+    "get_imported_names",
+    "get_imported_name_contexts",
+    "get_imported_name_sources",
+    "list_module_entries",
+    "get_sibling_module_names",
+    "exclude_sibling_module_names",
+]
 
 
-def get_imported_name_sources(trunk: list) -> set:
+def get_imported_names(trunk: list) -> set:
+    """
+    Return the set of top-level module names imported (absolutely) in `trunk`,
+    including any standard library modules.
+    """
     import_types = [IType, IFType]
-    stdlib_modules = stdlib_module_names()
     imports = set()
     for node in trunk:
         if type(node) not in import_types:
@@ -26,21 +43,183 @@ def get_imported_name_sources(trunk: list) -> set:
             # 'import from' statement will only be a single module name
             imports.add(node.module)
     imports = {i.split(".")[0] if "." in i else i for i in imports}
+    return imports
+
+
+class ImportContext(Enum):
+    """
+    Where an import statement is in a module, in increasing order of precedence
+    (an import in a function in a `try` block handling `ImportError` is optional).
+    """
+
+    TopLevel = "top-level"  # executed when the module is imported
+    Lazy = "lazy"  # in a function, executed only if it is called
+    Optional = "optional"  # in a `try` block which handles `ImportError`
+    TypeChecking = "type-checking"  # under `if TYPE_CHECKING:`, never executed
+
+
+context_precedence = {context: rank for rank, context in enumerate(ImportContext)}
+import_error_names = [
+    "ImportError",
+    "ModuleNotFoundError",
+    "Exception",
+    "BaseException",
+]
+statement_fields = ["body", "orelse", "handlers", "finalbody", "cases"]
+
+
+class ImportVisitor(NodeVisitor):
+    """
+    Collect the top-level names of the modules imported (absolutely) anywhere in
+    a module, each with the context(s) it is imported in. Only statements are
+    visited (expressions cannot contain imports), so this single pass costs
+    little more than looking at the module's top-level statements alone.
+    """
+
+    def __init__(self):
+        self.imports: dict[str, set[ImportContext]] = {}
+        self.context = ImportContext.TopLevel
+
+    def add_import(self, module_name: str) -> None:
+        name = module_name.split(".")[0]
+        self.imports.setdefault(name, set()).add(self.context)
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            self.add_import(alias.name)
+
+    def visit_ImportFrom(self, node):
+        if node.level == 0:  # ignore relative imports
+            self.add_import(node.module)
+
+    def visit_in_context(self, nodes: list, context: ImportContext) -> None:
+        outer_context = self.context
+        if context_precedence[context] > context_precedence[outer_context]:
+            self.context = context
+        for node in nodes:
+            self.visit(node)
+        self.context = outer_context
+
+    def visit_FunctionDef(self, node):
+        self.visit_in_context(node.body, ImportContext.Lazy)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_If(self, node):
+        test = node.test
+        if (isinstance(test, Name) and test.id == "TYPE_CHECKING") or (
+            isinstance(test, Attribute) and test.attr == "TYPE_CHECKING"
+        ):
+            self.visit_in_context(node.body, ImportContext.TypeChecking)
+            for child in node.orelse:
+                self.visit(child)
+        else:
+            self.generic_visit(node)
+
+    def visit_Try(self, node):
+        if any(handles_import_error(h.type) for h in node.handlers):
+            self.visit_in_context(node.body, ImportContext.Optional)
+            for field in ["handlers", "orelse", "finalbody"]:
+                for child in getattr(node, field):
+                    self.visit(child)
+        else:
+            self.generic_visit(node)
+
+    visit_TryStar = visit_Try
+
+    def generic_visit(self, node):
+        for field in statement_fields:
+            for child in getattr(node, field, []):
+                self.visit(child)
+
+
+def handles_import_error(exc_type) -> bool:
+    """
+    Whether an `except` clause for the exception type(s) `exc_type` would catch
+    an `ImportError` (a bare `except:` has no type).
+    """
+    if exc_type is None:
+        return True
+    elif isinstance(exc_type, Tuple):
+        return any(handles_import_error(t) for t in exc_type.elts)
+    return isinstance(exc_type, Name) and exc_type.id in import_error_names
+
+
+def get_imported_name_contexts(tree: Module) -> dict[str, set[ImportContext]]:
+    """
+    Return the top-level module names imported (absolutely) anywhere in the
+    module `tree`, including any standard library modules, mapped to the
+    context(s) they are imported in.
+    """
+    visitor = ImportVisitor()
+    visitor.visit(tree)
+    return visitor.imports
+
+
+def get_imported_name_sources(trunk: list) -> set:
+    stdlib_modules = stdlib_module_names()
+    imports = get_imported_names(trunk)
     potential_nonstdlib_imports = imports.difference(stdlib_modules)
     return potential_nonstdlib_imports
 
 
-def get_sibling_module_names(target_module_path: Path) -> set:
+def list_module_entries(directory: Path, sibling_cache: dict | None = None) -> dict:
+    """
+    Map the names of the modules importable from `directory` to the names of
+    the entries providing them: either those files ending in `.py` or
+    directories (which do not need to contain an `__init__.py` due to implicit
+    namespaces).
+
+    The directory is listed with `os.scandir` so entry types come from the
+    listing rather than a stat call per entry. If a `sibling_cache` dict is given
+    each directory is listed only once, and stored in it for later calls.
+    """
+    if sibling_cache is not None and directory in sibling_cache:
+        return sibling_cache[directory]
+    module_entries: dict[str, list[str]] = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            entry_path = Path(entry.name)
+            if entry.is_dir() or entry_path.suffix == ".py":
+                module_entries.setdefault(entry_path.stem, []).append(entry.name)
+    if sibling_cache is not None:
+        sibling_cache[directory] = module_entries
+    return module_entries
+
+
+def get_sibling_module_names(
+    target_module_path: Path,
+    sibling_cache: dict | None = None,
+) -> set:
     """
     Given a source module at `target_module_path`, determine the names
     of any modules it may import in the local directory: either those
     files ending in `.py` or directories (which do not need to contain
     an `__init__.py` due to implicit namespaces).
     """
+    module_entries = list_module_entries(target_module_path.parent, sibling_cache)
     names = {
-        f.stem
-        for f in target_module_path.parent.iterdir()
-        if f.name != target_module_path.name
-        if f.is_dir() or f.suffix == ".py"
+        name
+        for name, entry_names in module_entries.items()
+        if entry_names != [target_module_path.name]
     }
     return names
+
+
+def exclude_sibling_module_names(
+    imported_names: set,
+    target_module_path: Path,
+    sibling_cache: dict | None = None,
+) -> set:
+    """
+    Remove the names of modules in the same directory as `target_module_path`
+    (see `get_sibling_module_names`) from its `imported_names`, checking only
+    the imported names rather than building the full set of sibling names.
+    """
+    module_entries = list_module_entries(target_module_path.parent, sibling_cache)
+    return {
+        name
+        for name in imported_names
+        if module_entries.get(name, [target_module_path.name])
+        == [target_module_path.name]
+    }
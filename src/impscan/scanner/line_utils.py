@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import re
+import unicodedata
+
+__all__ = ["scan_imported_names"]
+
+# Lex only what can hide or join statements: strings (so that lines inside them
+# are not mistaken for imports), comments, and semicolons followed by an import.
+# Any other `import`/`from` line beginning in column 0 is a module-level import.
+LEXEME_RE = re.compile(
+    r"""
+    (?P<string>
+        \"\"\"(?:[^\\]|\\.)*?\"\"\"
+        | '''(?:[^\\]|\\.)*?'''
+        | "(?:[^"\\\n]|\\.)*"
+        | '(?:[^'\\\n]|\\.)*'
+    )
+    | (?P<comment>\#[^\n]*)
+    | ^(?P<statement>(?:import|from)\b[^\n]*)
+    | (?P<semicolon>;[ \t]*(?:import|from)\b)
+    """,
+    re.MULTILINE | re.DOTALL | re.VERBOSE,
+)
+DOTTED_NAME = r"\w+(?:\s*\.\s*\w+)*"
+IMPORT_ALIAS_RE = re.compile(rf"\s*({DOTTED_NAME})(?:\s+as\s+\w+)?\s*")
+FROM_RE = re.compile(rf"from(?:\s+|(?=\.))(\.*)\s*(?:({DOTTED_NAME})\s+)?import\b")
+
+
+def scan_imported_names(source: str) -> set | None:
+    """
+    Return the set of top-level module names imported (absolutely) at module
+    level in the Python `source`, as `get_imported_names` would from its AST, by
+    scanning its lines rather than parsing it. Return `None` if any statement is
+    ambiguous without parsing (e.g. an `import` continued with a backslash or
+    joined to another statement by a semicolon), in which case the source should
+    be parsed instead.
+
+    Note: unlike parsing, this does not detect syntax errors.
+    """
+    if "import" not in source:
+        return set()  # No import statements, so no need to scan it
+    if "\r" in source:
+        source = source.replace("\r\n", "\n").replace("\r", "\n")
+    imports = set()
+    for lexeme in LEXEME_RE.finditer(source):
+        if lexeme.lastgroup == "semicolon":
+            return None
+        elif lexeme.lastgroup != "statement":
+            continue
+        statement = lexeme.group("statement").partition("#")[0].rstrip()
+        if any(c in statement for c in "'\";"):
+            return None
+        if statement.startswith("import"):
+            if statement.endswith("\\"):
+                return None  # the rest of the module names are on the next line
+            aliases = statement[len("import") :].split(",")
+            matches = [IMPORT_ALIAS_RE.fullmatch(a) for a in aliases]
+            if not all(matches):
+                return None
+            imports.update(m.group(1) for m in matches)
+        else:
+            # Only the module name is needed, so a continued name list is fine
+            from_match = FROM_RE.match(statement)
+            if from_match is None:
+                return None  # e.g. `raise ... from ...` continued across lines
+            dots, module = from_match.groups()
+            if dots:
+                continue  # ignore relative imports
+            elif module is None:
+                return None
+            imports.add(module)
+    top_level_names = set()
+    for name in imports:
+        name = name.split(".")[0].strip()
+        if not name.isascii():
+            name = unicodedata.normalize("NFKC", name)  # as the parser does
+        top_level_names.add(name)
+    return top_level_names
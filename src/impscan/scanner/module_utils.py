@@ -1,18 +1,39 @@
+from __future__ import annotations
+
+import shutil
+import subprocess
 import sys
+from functools import lru_cache
 from pathlib import Path
 
-__all__ = ["stdlib_module_names", "stdlib_dynload_module_names"]
+__all__ = [
+    "stdlib_module_names",
+    "stdlib_dynload_module_names",
+    "target_stdlib_module_names",
+    "load_stdlib_module_names",
+]
 
 
-def stdlib_module_names() -> set:
+@lru_cache(maxsize=None)
+def stdlib_module_names(version: str | None = None) -> frozenset:
     """
-    Get the path to the standard library by using the `sys.modules` list,
-    specifically the filepath stored for a non-builtin library (pathlib),
-    and use this path to detect all standard library module names rather
-    than hard-code them.
+    Return a set of all the modules in the standard library, computed once per
+    process (for each `version`) and shared by all callers.
+
+    For the running interpreter this is `sys.stdlib_module_names` where it exists
+    (Python 3.10+), otherwise the names are detected rather than hard-coded, from
+    the path to the standard library given by the filepath stored in `sys.modules`
+    for a non-builtin library (pathlib).
 
-    Return a set of all the modules in the standard library.
+    If a different `version` is given (e.g. "3.8", or "3.8.10" as the standard
+    library is the same for each patch version) then the interpreter for that
+    version (`python3.8`) is run to list its standard library module names.
     """
+    running_version = "{}.{}".format(*sys.version_info)
+    if version is not None and minor_version(version) != running_version:
+        return target_stdlib_module_names(version)
+    if hasattr(sys, "stdlib_module_names"):
+        return frozenset(sys.stdlib_module_names)
     stdlib_path = Path(sys.modules["pathlib"].__file__).parent
     stdlib_modules = set(sys.builtin_module_names)
     for p in stdlib_path.iterdir():
@@ -26,7 +47,7 @@ def stdlib_module_names() -> set:
             continue
         stdlib_modules.add(module)
     dynload_modules = stdlib_dynload_module_names(stdlib_path)
-    return stdlib_modules.union(dynload_modules)
+    return frozenset(stdlib_modules.union(dynload_modules))
 
 
 def stdlib_dynload_module_names(stdlib_path: Path) -> set:
@@ -46,3 +67,42 @@ def stdlib_dynload_module_names(stdlib_path: Path) -> set:
         d.name.split(".")[0] for d in dynload_path.iterdir() if d.suffix == ".so"
     }
     return dynload_module_names
+
+
+def minor_version(version: str) -> str:
+    """
+    Reduce a Python `version` to its major and minor parts ("3.11.7" to "3.11").
+    """
+    return ".".join(version.split(".")[:2])
+
+
+def target_stdlib_module_names(version: str) -> frozenset:
+    """
+    Run this module as a script with the interpreter for the Python `version`
+    (reduced to its minor version) found on the PATH, to list the modules in its
+    standard library. Raise `FileNotFoundError` if there is no such interpreter,
+    or `CalledProcessError` if it fails to run (e.g. a pyenv shim for a version
+    that is not installed).
+    """
+    version = minor_version(version)
+    interpreter = shutil.which(f"python{version}")
+    if interpreter is None:
+        raise FileNotFoundError(
+            f"No python{version} on the PATH to list its stdlib modules from"
+            " (pass a list of them instead)",
+        )
+    cmd = [interpreter, __file__]
+    listed = subprocess.run(cmd, capture_output=True, check=True).stdout.decode()
+    return frozenset(listed.split())
+
+
+def load_stdlib_module_names(stdlib_list_path: Path) -> frozenset:
+    """
+    Read an explicit list of standard library module names for a target Python,
+    one per line (as printed when running this module as a script with it).
+    """
+    return frozenset(stdlib_list_path.read_text().split())
+
+
+if __name__ == "__main__":
+    print("\n".join(sorted(stdlib_module_names())))
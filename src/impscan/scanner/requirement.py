@@ -1,21 +1,95 @@
+from __future__ import annotations
+
 from pathlib import Path
 
 # from typing import TYPE_CHECKING
 import impscan
 
 from .ast_parsing import ParsedPy
+from .import_utils import ImportContext
+
+__all__ = ["EnvReqs", "FileImports"]
+
+
+class FileImports:
+    """
+    The result of scanning one Python file: the names it imports that are not in
+    the stdlib or sibling modules (`imports`), the contexts each name is imported
+    in, and whether decoding it needed the chardet fallback.
+    """
 
-__all__ = ["EnvReqs"]
+    def __init__(
+        self,
+        path: Path,
+        imports: set,
+        import_contexts: dict[str, frozenset[ImportContext]],
+        used_fallback: bool = False,
+    ):
+        self.path = path
+        self.imports = imports
+        self.import_contexts = import_contexts
+        self.used_fallback = used_fallback
+
+    def __repr__(self):
+        return f"FileImports::'{self.path}'"
 
 
 class EnvReqs:
     def __init__(self, env_config: impscan.config.EnvConfig):
         self.registered_imports = set()
         self.env_config = env_config
-        self.registered_files = []
+        self.registered_files = []  # Left empty unless `env_config.keep_files`
+        self.n_files = 0
+        self.n_fallback_decoded = 0  # Files whose encoding chardet had to detect
+        self.import_contexts: dict[str, set[ImportContext]] = {}
+
+    def register(
+        self,
+        python_file: Path,
+        imports: set | None = None,
+        import_contexts: dict | None = None,
+    ):
+        """
+        Parse the imports of `python_file` (unless the set of `imports` it makes
+        was already retrieved) and add the allowed ones to `registered_imports`,
+        recording the contexts they are imported in (if given, else top-level).
+        The file is kept in `registered_files` if `env_config.keep_files` is set.
+        """
+        if imports is None or self.env_config.keep_files:
+            parsed_py_file = ParsedPy(python_file, self.env_config, imports=imports)
+            imports = parsed_py_file.imports
+            if self.env_config.keep_files:
+                self.registered_files.append(parsed_py_file)
+        if imports:
+            allowed_imports = imports.difference(self.env_config.banned_imports)
+            self.registered_imports.update(allowed_imports)
+            for name in allowed_imports:
+                contexts = (import_contexts or {}).get(name, [ImportContext.TopLevel])
+                self.import_contexts.setdefault(name, set()).update(contexts)
+        self.n_files += 1
+
+    @classmethod
+    def combined(cls, env_reqs_list: list[EnvReqs]) -> EnvReqs:
+        """
+        Combine the requirements from several scans (with the same config).
+        """
+        combined = cls(env_reqs_list[0].env_config)
+        for env_reqs in env_reqs_list:
+            combined.registered_imports.update(env_reqs.registered_imports)
+            combined.registered_files.extend(env_reqs.registered_files)
+            combined.n_files += env_reqs.n_files
+            combined.n_fallback_decoded += env_reqs.n_fallback_decoded
+            for name, contexts in env_reqs.import_contexts.items():
+                combined.import_contexts.setdefault(name, set()).update(contexts)
+        return combined
 
-    def register(self, python_file: Path):
-        parsed_py_file = ParsedPy(python_file, self.env_config)
-        if parsed_py_file.imports:
-            self.registered_imports.update(parsed_py_file.allowed_imports)
-        self.registered_files.append(parsed_py_file)
+    def register_file_imports(self, file_imports: FileImports):
+        """
+        Register the result of scanning a file (as yielded by `iter_scan_imports`).
+        """
+        self.register(
+            file_imports.path,
+            imports=file_imports.imports,
+            import_contexts=file_imports.import_contexts,
+        )
+        self.n_fallback_decoded += file_imports.used_fallback
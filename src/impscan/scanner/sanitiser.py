@@ -1,9 +1,30 @@
+from __future__ import annotations
+
+import os
+import re
+from collections.abc import Iterator
+from fnmatch import fnmatchcase
 from pathlib import Path
 
-__all__ = ["is_ignored_path"]
+__all__ = ["is_ignored_path", "walk_python_files", "GitIgnoreRule"]
 
 ignore_part_names = [".eggs", "*.egg-info"]
 
+# Directories never worth descending into to find a project's own imports
+ignore_dir_globs = [
+    ".git",
+    ".hg",
+    ".svn",
+    ".venv",
+    "venv",
+    "node_modules",
+    "build",
+    "__pycache__",
+    ".tox",
+    ".nox",
+    *ignore_part_names,
+]
+
 
 def is_ignored_path(path: Path):
     """
@@ -19,3 +40,127 @@ def is_ignored_path(path: Path):
         if is_ignored:
             break
     return is_ignored
+
+
+class GitIgnoreRule:
+    """
+    A pattern from a `.gitignore` file in the directory `base` (as a string, so
+    that paths below it can be made relative by slicing), following git's rules:
+    a leading `!` negates it, a trailing `/` matches only directories, and it is
+    matched against the path relative to `base` if it contains a `/` (otherwise
+    against the name alone, at any depth).
+    """
+
+    def __init__(self, base: str, pattern: str):
+        self.base = base
+        self.negate = pattern.startswith("!")
+        pattern = pattern[1:] if self.negate else pattern
+        self.dir_only = pattern.endswith("/")
+        pattern = pattern.rstrip("/")
+        self.anchored = "/" in pattern
+        self.regex = re.compile(glob_to_regex(pattern.lstrip("/")))
+
+    def matches(self, path: str, name: str, is_dir: bool) -> bool:
+        if self.dir_only and not is_dir:
+            return False
+        if self.anchored:
+            return self.regex.fullmatch(path[len(self.base) + 1 :]) is not None
+        return self.regex.fullmatch(name) is not None
+
+    @classmethod
+    def read_rules(cls, base: str) -> list[GitIgnoreRule]:
+        """
+        Read the rules in the `.gitignore` file in the directory `base`.
+        """
+        gitignore_path = Path(base, ".gitignore")
+        lines = gitignore_path.read_text(errors="replace").splitlines()
+        return [
+            cls(base=base, pattern=line.strip())
+            for line in lines
+            if line.strip() and not line.startswith("#")
+        ]
+
+
+def glob_to_regex(pattern: str) -> str:
+    """
+    Translate a gitignore glob to a regex: `*` and `?` do not match `/`, while
+    `**` matches across directories.
+    """
+    regex = ""
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+        elif pattern.startswith("**", i):
+            regex += ".*"
+            i += 2
+        elif pattern[i] == "*":
+            regex += "[^/]*"
+            i += 1
+        elif pattern[i] == "?":
+            regex += "[^/]"
+            i += 1
+        elif pattern[i] == "[" and pattern.find("]", i + 2) != -1:
+            end = pattern.find("]", i + 2)  # a class cannot be empty: "[]]" is "]"
+            char_class = pattern[i + 1 : end]
+            if char_class.startswith("!"):
+                char_class = "^" + char_class[1:]
+            regex += f"[{char_class}]"
+            i = end + 1
+        elif pattern[i] == "\\" and i + 1 < len(pattern):
+            regex += re.escape(pattern[i + 1])  # escaped literal e.g. "\#" or "\!"
+            i += 2
+        else:
+            regex += re.escape(pattern[i])
+            i += 1
+    return regex
+
+
+def is_gitignored(
+    rules: list[GitIgnoreRule],
+    path: str,
+    name: str,
+    is_dir: bool,
+) -> bool:
+    ignored = False
+    for rule in rules:  # the last matching rule wins
+        # Only a rule that would flip the current verdict needs to be matched
+        if ignored == rule.negate and rule.matches(path, name, is_dir):
+            ignored = not rule.negate
+    return ignored
+
+
+def walk_python_files(
+    source_path: Path,
+    ignore_globs: list[str] = ignore_dir_globs,
+    use_gitignore: bool = True,
+) -> Iterator[Path]:
+    """
+    Yield the Python files below `source_path` (or just `source_path` if it is a
+    file), in sorted order. Directories with names matching any of the
+    `ignore_globs`, or ignored by a `.gitignore` file within the tree (if
+    `use_gitignore` is True), are pruned rather than descended into, and files
+    matching these are skipped.
+    """
+    if source_path.is_file():
+        yield source_path
+        return
+    dir_rules: dict[str, list[GitIgnoreRule]] = {}
+    for dirpath, dirnames, filenames in os.walk(source_path):
+        rules = dir_rules.pop(dirpath, [])
+        if use_gitignore and ".gitignore" in filenames:
+            rules = rules + GitIgnoreRule.read_rules(base=dirpath)
+
+        def is_ignored(name: str, is_dir: bool) -> bool:
+            if any(fnmatchcase(name, glob) for glob in ignore_globs):
+                return True
+            path = os.path.join(dirpath, name)
+            return bool(rules) and is_gitignored(rules, path, name, is_dir)
+
+        dirnames[:] = sorted(d for d in dirnames if not is_ignored(d, is_dir=True))
+        for dirname in dirnames:
+            dir_rules[os.path.join(dirpath, dirname)] = rules
+        for filename in sorted(filenames):
+            if filename.endswith(".py") and not is_ignored(filename, is_dir=False):
+                yield Path(dirpath, filename)
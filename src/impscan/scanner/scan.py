@@ -1,30 +1,211 @@
+from __future__ import annotations
+
 # from types import TYPE_CHECKING
+import multiprocessing as mp
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import ExitStack, nullcontext
+from functools import partial
+from itertools import islice
+from multiprocessing import Pool
 from pathlib import Path
 
-from .requirement import EnvReqs
-from .sanitiser import is_ignored_path
+from ..share.multiproc_utils import multiprocess_map
+from .ast_utils import filter_imported_names, parse_imported_names
+from .import_utils import ImportContext
+from .module_utils import stdlib_module_names
+from .requirement import EnvReqs, FileImports
+from .sanitiser import ignore_dir_globs, walk_python_files
+from .scan_cache import ScanCache
 
-__all__ = ["scan_imports"]
+__all__ = [
+    "scan_imports",
+    "scan_imports_many",
+    "iter_scan_imports",
+    "iter_imported_names",
+]
 
 
-def scan_imports(source_path: Path, env_config) -> EnvReqs:
+def scan_imports(
+    source_path: Path,
+    env_config,
+    on_file: Callable[[FileImports], None] | None = None,
+) -> EnvReqs:
     """
     Execute the scan of import statements below `source_path`
     (either a Python file or a directory to be walked recursively to find
-    them), identifying the dependency graphs within the repositories
-    given in `env_config` and returning the list(s) of requirements for each.
+    them, skipping `env_config.ignore_globs` and anything in `.gitignore` as
+    well as virtual environments, build directories etc.), identifying the
+    dependency graphs within the repositories given in `env_config` and
+    returning the list(s) of requirements for each.
+
+    If `env_config.workers` is not 1, the files are parsed on a pool of that many
+    processes (0 meaning all CPU cores), giving the same result as a serial scan.
+    If `env_config.nested` is set, imports anywhere in a module are found (not
+    just at module level) and `EnvReqs.import_contexts` records where they are.
+    Otherwise if `env_config.extractor` is "fast", import statements are scanned for
+    rather than parsed where unambiguous. If `env_config.cache` is set, the names
+    imported by each file are cached in the source directory, and files unchanged
+    since the last scan are not parsed.
+    If `env_config.keep_files` is unset, only the union of the imports is kept.
+
+    If given, `on_file` is called with the record of each file's imports as soon
+    as it is scanned (e.g. for progress).
+    """
+    return scan_imports_into(
+        EnvReqs(env_config),
+        iter_scan_imports(source_path, env_config),
+        on_file=on_file,
+    )
+
+
+def scan_imports_many(
+    source_paths: Iterable[Path],
+    env_config,
+    on_file: Callable[[FileImports], None] | None = None,
+) -> list[EnvReqs]:
+    """
+    Scan the imports below each of the `source_paths` in turn as `scan_imports`
+    does (calling `on_file` likewise), sharing the worker pool and the modules
+    listed in each directory, and return a list of the requirements for each.
+    """
+    n_workers = env_config.workers or mp.cpu_count()
+    pool_context = nullcontext() if n_workers == 1 else Pool(n_workers)
+    sibling_cache: dict = {}
+    with pool_context as pool:
+        return [
+            scan_imports_into(
+                EnvReqs(env_config),
+                iter_scan_imports(path, env_config, sibling_cache, pool),
+                on_file=on_file,
+            )
+            for path in source_paths
+        ]
+
+
+def scan_imports_into(
+    env_reqs: EnvReqs,
+    file_imports: Iterable[FileImports],
+    on_file: Callable[[FileImports], None] | None = None,
+) -> EnvReqs:
+    """
+    Register each record of a file's imports in `env_reqs` (calling `on_file`
+    with it first, if given).
+    """
+    for record in file_imports:
+        if on_file is not None:
+            on_file(record)
+        env_reqs.register_file_imports(record)
+    return env_reqs
+
+
+def iter_scan_imports(
+    source_path: Path,
+    env_config,
+    sibling_cache: dict | None = None,
+    pool: mp.pool.Pool | None = None,
+) -> Iterator[FileImports]:
+    """
+    Scan the imports below `source_path` as `scan_imports` does, but yield a
+    record of each file's imports as soon as it is scanned (in sorted order)
+    rather than collecting them. The modules listed in each directory are kept
+    in `sibling_cache` and files are parsed on `pool` if given, so that these
+    can be shared by scans of several paths.
     """
     if not source_path.exists():
         raise FileNotFoundError(f"{source_path=} does not exist")
-    all_python_files = source_path.rglob("*.py")
-    env_reqs = EnvReqs(env_config)
-    if env_reqs.env_config.build_system:
+    all_python_files = walk_python_files(
+        source_path,
+        ignore_globs=[*ignore_dir_globs, *env_config.ignore_globs],
+        use_gitignore=env_config.gitignore,
+    )
+    if env_config.build_system:
         # What to do if more than one TOML here? Just aggregate?
         toml = list(source_path.rglob("pyproject.toml"))
         print(f"{toml=}")
         # TODO: parse
-    for py_file in all_python_files:
-        if is_ignored_path(py_file):
-            continue
-        env_reqs.register(py_file)
-    return env_reqs
+    stdlib_modules = env_config.stdlib_modules
+    if stdlib_modules is None:
+        stdlib_modules = stdlib_module_names(env_config.python_version)
+    if env_config.cache:
+        cache_dir = source_path if source_path.is_dir() else source_path.parent
+        cache_context = ScanCache(directory=cache_dir)
+    else:
+        cache_context = nullcontext()
+    if sibling_cache is None:
+        sibling_cache = {}  # Each directory's module names, listed once
+    with cache_context as scan_cache:
+        file_imports = iter_imported_names(
+            all_python_files,
+            n_workers=env_config.workers or mp.cpu_count(),
+            scan_cache=scan_cache,
+            extractor=env_config.extractor,
+            nested=env_config.nested,
+            pool=pool,
+        )
+        for py_file, name_contexts, used_fallback in file_imports:
+            imports = filter_imported_names(
+                name_contexts,
+                py_file,
+                stdlib_modules,
+                sibling_cache,
+            )
+            contexts = {name: name_contexts[name] for name in imports}
+            yield FileImports(py_file, imports, contexts, used_fallback)
+
+
+def iter_imported_names(
+    python_files: Iterable[Path],
+    n_workers: int = 1,
+    scan_cache: ScanCache | None = None,
+    extractor: str = "ast",
+    nested: bool = False,
+    pool: mp.pool.Pool | None = None,
+) -> Iterator[tuple[Path, dict[str, frozenset[ImportContext]], bool]]:
+    """
+    Yield each of the `python_files` with all the names it imports (mapped to
+    the contexts they are imported in) and whether decoding it needed the
+    chardet fallback (as given by `parse_imported_names` with the given
+    `extractor` and `nested` setting), in order. Files are parsed on a pool of
+    `n_workers` processes if more than 1 (or on `pool` if given), and if a
+    `scan_cache` is given only files changed since they were cached get parsed
+    (then cached, so never count as fallbacks).
+
+    The files are taken from `python_files` (e.g. as a directory walk finds them)
+    a window at a time: one file if parsing serially, or enough to keep every
+    worker busy, so that memory use does not grow with the number of files.
+    """
+    parse = partial(parse_imported_names, extractor=extractor, nested=nested)
+    serial = n_workers == 1 and pool is None
+    # Send files to the workers in chunks (several per worker) to limit IPC
+    chunksize = 16
+    window_size = 1 if serial else n_workers * chunksize * 4
+    files = iter(python_files)
+    with ExitStack() as stack:
+        while window := list(islice(files, window_size)):
+            cached = {}
+            if scan_cache is not None:
+                for py_file in window:
+                    imported_names = scan_cache.lookup(py_file, nested=nested)
+                    if imported_names is not None:
+                        cached[py_file] = imported_names
+            to_parse = [p for p in window if p not in cached]
+            if serial or len(to_parse) < 2:
+                parsed = map(parse, to_parse)
+            else:
+                if pool is None:  # started once there are files to parse on it
+                    pool = stack.enter_context(Pool(n_workers))
+                parsed = multiprocess_map(
+                    parse,
+                    to_parse,
+                    n_cores=n_workers,
+                    chunksize=max(1, len(to_parse) // (n_workers * 4)),
+                    pool=pool,
+                )
+            for py_file in window:
+                if py_file in cached:
+                    imported_names, used_fallback = cached[py_file], False
+                else:
+                    imported_names, used_fallback = next(parsed)
+                    if scan_cache is not None:
+                        scan_cache.store(py_file, imported_names, nested=nested)
+                yield py_file, imported_names, used_fallback
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+from pathlib import Path
+
+from .import_utils import ImportContext
+
+__all__ = ["ScanCache"]
+
+
+def file_digest(py_file_path: Path) -> str:
+    return hashlib.blake2b(py_file_path.read_bytes(), digest_size=16).hexdigest()
+
+
+class ScanCache:
+    """
+    On-disk cache of the names imported by each Python file scanned, so that
+    files unchanged since the last scan are not decoded and parsed again.
+
+    A cached file is unchanged if its modification time and size match those
+    stored, or failing that if its content hash does (e.g. after a fresh checkout).
+    Changes are committed when the cache is closed (on exiting its context).
+    """
+
+    filename = ".impscan_cache.db"  # Default value
+    schema_version = 3  # Increment to discard caches written in an older format
+
+    def __init__(self, directory: Path, filename: str = filename):
+        self.directory = directory
+        self.filename = filename
+        self.conn: sqlite3.Connection | None = None
+
+    @property
+    def path(self) -> Path:
+        return self.directory / self.filename
+
+    def open(self) -> None:
+        self.conn = sqlite3.connect(self.path)
+        (version,) = self.conn.execute("PRAGMA user_version").fetchone()
+        if version != self.schema_version:
+            self.conn.execute("DROP TABLE IF EXISTS scanned_files")
+            self.conn.execute(f"PRAGMA user_version = {self.schema_version}")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS scanned_files
+            (path text, mtime_ns integer, size integer, digest text,
+            nested integer, importednames text, PRIMARY KEY (path, nested))
+            """,
+        )
+
+    def close(self) -> None:
+        if self.conn is not None:
+            self.conn.commit()
+            self.conn.close()
+            self.conn = None
+
+    def __enter__(self) -> ScanCache:
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def lookup(
+        self,
+        py_file_path: Path,
+        nested: bool = False,
+    ) -> dict[str, frozenset[ImportContext]] | None:
+        """
+        Return the cached imported names (mapped to the contexts they are imported
+        in) for `py_file_path` if it is unchanged since they were stored, and if
+        they were found in the same way (`nested` or module-level only), otherwise
+        `None`.
+        """
+        row = self.conn.execute(
+            "SELECT mtime_ns, size, digest, importednames FROM scanned_files"
+            " WHERE path == ? AND nested == ?",
+            (str(py_file_path), nested),
+        ).fetchone()
+        if row is None:
+            return None
+        mtime_ns, size, digest, imported_names = row
+        st = py_file_path.stat()
+        if (st.st_mtime_ns, st.st_size) != (mtime_ns, size):
+            if file_digest(py_file_path) != digest:
+                return None
+            # Content unchanged (e.g. touched or checked out again): refresh stat
+            self.conn.execute(
+                "UPDATE scanned_files SET mtime_ns = ?, size = ?"
+                " WHERE path == ? AND nested == ?",
+                (st.st_mtime_ns, st.st_size, str(py_file_path), nested),
+            )
+        return {
+            name: frozenset(map(ImportContext, contexts))
+            for name, contexts in json.loads(imported_names).items()
+        }
+
+    def store(
+        self,
+        py_file_path: Path,
+        imported_names: dict[str, frozenset[ImportContext]],
+        nested: bool = False,
+    ) -> None:
+        st = py_file_path.stat()
+        serialised = {
+            name: sorted(context.value for context in contexts)
+            for name, contexts in imported_names.items()
+        }
+        self.conn.execute(
+            "INSERT OR REPLACE INTO scanned_files VALUES (?,?,?,?,?,?)",
+            (
+                str(py_file_path),
+                st.st_mtime_ns,
+                st.st_size,
+                file_digest(py_file_path),
+                nested,
+                json.dumps(serialised, sort_keys=True),
+            ),
+        )
@@ -2,12 +2,12 @@ from __future__ import annotations
 
 import multiprocessing as mp
 from multiprocessing import Pool, Process
-from collections.abc import Callable
+from collections.abc import Callable, Iterable, Iterator
 
 from more_itertools import chunked
 from tqdm import tqdm
 
-__all__ = ["batch_multiprocess", "batch_multiprocess_with_return"]
+__all__ = ["batch_multiprocess", "batch_multiprocess_with_return", "multiprocess_map"]
 
 
 def batch_multiprocess(
@@ -56,3 +56,23 @@ def batch_multiprocess_with_return(
     pool.close()
     pool.join()
     return pool_results
+
+
+def multiprocess_map(
+    func: Callable,
+    items: Iterable,
+    n_cores: int = mp.cpu_count(),
+    chunksize: int = 1,
+    pool: mp.pool.Pool | None = None,
+) -> Iterator:
+    """
+    Map `func` over `items` on a pool of `n_cores` processes (default: all
+    CPU cores), yielding the results in the same order as `items` as soon as
+    each is ready. `func` must be picklable (i.e. defined at module level).
+    If a `pool` is given it is used (and left open) rather than starting one.
+    """
+    if pool is not None:
+        yield from pool.imap(func, items, chunksize=chunksize)
+        return
+    with Pool(processes=n_cores) as pool:
+        yield from pool.imap(func, items, chunksize=chunksize)
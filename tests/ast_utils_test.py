@@ -0,0 +1,91 @@
+import ast
+import os
+from pathlib import Path
+
+from pytest import mark
+
+from impscan.scanner.ast_utils import decode_source
+from impscan.scanner.import_utils import get_imported_names
+from impscan.scanner.line_utils import scan_imported_names
+
+SOURCE = "# Café\nimport numpy\n"
+
+
+@mark.parametrize(
+    "source_bytes",
+    [
+        SOURCE.encode(),
+        b"\xef\xbb\xbf" + SOURCE.encode(),
+        ("# -*- coding: latin-1 -*-\n" + SOURCE).encode("latin-1"),
+    ],
+    ids=["utf8", "utf8-bom", "latin1-cookie"],
+)
+def test_decode_source_fast_path(source_bytes):
+    """
+    UTF-8 (with or without a BOM) and files declaring their encoding in a coding
+    cookie are decoded without guessing the encoding with chardet.
+    """
+    decoded, used_fallback = decode_source(source_bytes)
+
+    assert decoded.endswith(SOURCE)
+    assert not used_fallback
+
+
+def test_decode_source_fallback():
+    """
+    Non-UTF-8 bytes with no coding cookie have their encoding detected by chardet.
+    """
+    source = "# Ça coûte très cher à Noël, déjà vu\nimport numpy\n" * 5
+    decoded, used_fallback = decode_source(source.encode("latin-1"))
+
+    assert "import numpy" in decoded
+    assert used_fallback
+
+
+STDLIB_CORPUS = sorted(Path(os.__file__).parent.glob("*.py"))
+
+TRICKY_SOURCE = '''"""
+import not_a_module
+"""
+from __future__ import annotations
+import a.b as ab, c  # import d
+from e.f import (g,
+h)
+from ._private import i
+from . import j
+from k import l, \\
+    m
+s = "import n"; t = 1
+if TYPE_CHECKING: import o
+def f():
+    import p
+'''
+
+
+def test_fast_extractor_parity():
+    """
+    Scanning for import statements gives the same names as parsing the AST, for
+    every file in the standard library directory.
+    """
+    n_scanned = 0
+    for py_file in STDLIB_CORPUS:
+        source, _ = decode_source(py_file.read_bytes())
+        scanned = scan_imported_names(source)
+        if scanned is None:
+            continue  # ambiguous, would be parsed
+        n_scanned += 1
+
+        assert get_imported_names(ast.parse(source).body) == scanned, py_file
+    assert n_scanned > 0.9 * len(STDLIB_CORPUS)
+
+
+def test_fast_extractor_tricky_source():
+    """
+    Lines inside strings, comments, relative imports and imports below module
+    level are not counted, and a semicolon before an import defers to parsing.
+    """
+    scanned = scan_imported_names(TRICKY_SOURCE)
+
+    assert get_imported_names(ast.parse(TRICKY_SOURCE).body) == scanned
+    assert {"__future__", "a", "c", "e", "k"} == scanned
+    assert scan_imported_names("x = 1; import y\n") is None
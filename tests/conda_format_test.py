@@ -1,10 +1,17 @@
-from pytest import fixture
+import io
+from pathlib import Path
+
+import _json
+from pytest import fixture, mark
 
 from impscan.conda_meta.formats import CondaArchive
 
 EXAMPLE_CONDA_URL = (
     "https://repo.anaconda.com/pkgs/main/linux-64/tqdm-4.19.5-py27_0.conda"
 )
+EXAMPLE_BZ2_URL = (
+    "https://repo.anaconda.com/pkgs/main/linux-64/tqdm-4.19.5-py27_0.tar.bz2"
+)
 
 
 @fixture(scope="session")
@@ -14,3 +21,34 @@ def example_conda_archive():
 
 def test_conda_archive(example_conda_archive):
     example_conda_archive
+
+
+@mark.skipif(not hasattr(_json, "__file__"), reason="_json is built in")
+def test_site_package_names_extract_libraries_once():
+    """
+    The shared libraries in site-packages are all extracted in one pass over the
+    package, and a library that exports no module stops the names after it being
+    added until a 'regular' package name is seen (as when verified one by one).
+    """
+    archive = CondaArchive(source_url=EXAMPLE_BZ2_URL, defer_pull=True)
+    archive.package_name = "example"
+    site_pkgs = "lib/python3.11/site-packages"
+    json_so = Path(_json.__file__)
+    archive.path_json = {
+        "paths": [
+            {"_path": f"{site_pkgs}/{json_so.name}"},
+            {"_path": f"{site_pkgs}/not_an_extension.cpython-311-x86_64-linux-gnu.so"},
+            {"_path": f"{site_pkgs}/example-data/README"},
+            {"_path": f"{site_pkgs}/example/__init__.py"},
+        ],
+    }
+    extracted = []
+
+    def read_bz2(paths):
+        extracted.append(paths)
+        members = {f"{site_pkgs}/{json_so.name}": json_so.read_bytes()}
+        return [io.BytesIO(members.get(p, b"")) for p in paths]
+
+    archive.read_bz2 = read_bz2
+    assert "example,_json" == archive.determine_site_package_name()
+    assert 1 == len(extracted)
@@ -0,0 +1,111 @@
+import tarfile
+from functools import partial
+
+from httpx import ConnectTimeout
+
+from impscan.conda_meta.streaming_formats import CondaArchiveStream
+from impscan.db import generate_db_async_streaming
+from impscan.db.db_utils import CondaPackageDB, PopulationStatus
+from impscan.db.generate_db_async_streaming import CondaArchiveListings
+
+CHANNEL_URL = "https://conda.anaconda.org/conda-forge/noarch"
+LISTINGS = [
+    (name, [{"version": "1.0", "build": "0", "fn": fn, "url": f"{CHANNEL_URL}/{fn}"}])
+    for name, fn in [(n, f"{n}-1.0-0.conda") for n in ["aaa", "bad", "ccc"]]
+]
+
+
+def read_db_entry(archive: CondaArchiveStream) -> dict[str, str]:
+    """
+    Stand in for reading an archive, which is corrupt if its name is "bad".
+    """
+    name = archive.filename.split("-")[0]
+    if name == "bad":
+        raise tarfile.ReadError("not a bzip2 file")
+    return {
+        "pkgname": name,
+        "impname": name,
+        "channel": archive.channel,
+        "depends": "[]",
+        "fn": archive.filename,
+        "url": archive.url,
+        "version": "1.0",
+        "rootpkgs": "",
+    }
+
+
+def test_corrupt_archive_is_skipped(tmp_path, monkeypatch):
+    """
+    An archive that cannot be read is recorded as failed, and the archives after
+    it are still inserted.
+    """
+    monkeypatch.setattr(CondaArchiveStream, "read_db_entry", read_db_entry)
+    db = CondaPackageDB(dir=tmp_path)
+    monkeypatch.setattr(
+        generate_db_async_streaming,
+        "CondaPackageDB",
+        partial(CondaPackageDB, dir=tmp_path),
+    )
+    CondaArchiveListings(listings=LISTINGS)
+
+    assert {
+        PopulationStatus.Done: 2,
+        PopulationStatus.Failed: 1,
+    } == db.population_progress()
+    assert db.has_package("ccc")
+    assert not db.has_package("bad")
+
+
+def test_transient_errors_are_retried(tmp_path, monkeypatch):
+    """
+    An archive is retried after a transient network error, and recorded as failed
+    (without stopping the population) if the error persists after all retries.
+    """
+    attempts = {"aaa": 0, "bad": 0}
+
+    def read_db_entry_timing_out(archive: CondaArchiveStream) -> dict[str, str]:
+        name = archive.filename.split("-")[0]
+        if name in attempts:
+            attempts[name] += 1
+            if name == "bad" or attempts[name] == 1:
+                raise ConnectTimeout("timed out")
+        return read_db_entry(archive)
+
+    monkeypatch.setattr(CondaArchiveStream, "read_db_entry", read_db_entry_timing_out)
+    db = CondaPackageDB(dir=tmp_path)
+    monkeypatch.setattr(
+        generate_db_async_streaming,
+        "CondaPackageDB",
+        partial(CondaPackageDB, dir=tmp_path),
+    )
+    CondaArchiveListings(listings=LISTINGS)
+
+    assert {"aaa": 2, "bad": 3} == attempts
+    assert {
+        PopulationStatus.Done: 2,
+        PopulationStatus.Failed: 1,
+    } == db.population_progress()
+    assert db.has_package("aaa")
+
+
+def test_refresh_exports_index_once(tmp_path, monkeypatch):
+    """
+    Refreshing exports the import index once, after the stale archives are pruned.
+    """
+    exported = []
+
+    def export_import_index(db, index=None):
+        exported.append(db.population_progress())
+
+    monkeypatch.setattr(CondaArchiveStream, "read_db_entry", read_db_entry)
+    monkeypatch.setattr(CondaPackageDB, "export_import_index", export_import_index)
+    monkeypatch.setattr(
+        generate_db_async_streaming,
+        "CondaPackageDB",
+        partial(CondaPackageDB, dir=tmp_path),
+    )
+    CondaArchiveListings(listings=LISTINGS[:1])
+    exported.clear()
+    CondaArchiveListings(listings=LISTINGS[2:], refresh=True)
+
+    assert [{PopulationStatus.Done: 1}] == exported
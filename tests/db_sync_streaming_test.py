@@ -1,3 +1,59 @@
+import tarfile
+from functools import partial
+
+from impscan.conda_meta.streaming_formats import CondaArchiveStream
+from impscan.db import generate_db_sync_streaming
+from impscan.db.db_utils import CondaPackageDB, PopulationStatus
+from impscan.db.generate_db_sync_streaming import populate_conda_package_db
+
+CHANNEL_URL = "https://conda.anaconda.org/conda-forge/noarch"
+LISTINGS = [
+    (name, [{"version": "1.0", "build": "0", "fn": fn, "url": f"{CHANNEL_URL}/{fn}"}])
+    for name, fn in [(n, f"{n}-1.0-0.conda") for n in ["aaa", "bad", "ccc"]]
+]
+
+
+def read_db_entry(archive: CondaArchiveStream) -> dict[str, str]:
+    """
+    Stand in for reading an archive, which is corrupt if its name is "bad".
+    """
+    name = archive.filename.split("-")[0]
+    if name == "bad":
+        raise tarfile.ReadError("not a bzip2 file")
+    return {
+        "pkgname": name,
+        "impname": name,
+        "channel": archive.channel,
+        "depends": "[]",
+        "fn": archive.filename,
+        "url": archive.url,
+        "version": "1.0",
+        "rootpkgs": "",
+    }
+
+
 def test_db_population():
     # populate_conda_package_db()
     pass  # lol don't do this
+
+
+def test_corrupt_archive_is_skipped(tmp_path, monkeypatch):
+    """
+    An archive that cannot be read is recorded as failed, and the archives after
+    it are still inserted.
+    """
+    monkeypatch.setattr(CondaArchiveStream, "read_db_entry", read_db_entry)
+    db = CondaPackageDB(dir=tmp_path)
+    monkeypatch.setattr(
+        generate_db_sync_streaming,
+        "CondaPackageDB",
+        partial(CondaPackageDB, dir=tmp_path),
+    )
+    populate_conda_package_db(listings=LISTINGS)
+
+    assert {
+        PopulationStatus.Done: 2,
+        PopulationStatus.Failed: 1,
+    } == db.population_progress()
+    assert db.has_package("ccc")
+    assert not db.has_package("bad")
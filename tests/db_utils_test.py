@@ -0,0 +1,248 @@
+import sqlite3
+
+from pytest import fixture, raises
+
+from impscan.config import EnvConfig
+from impscan.db.db_utils import CondaPackageDB, PopulationStatus
+from impscan.db.import_index import ImportIndex
+from impscan.lookup.conda_util import conda_search_reqs
+from impscan.scanner.requirement import EnvReqs
+
+
+def make_entry(pkgname, impname, channel="main", version="1.0"):
+    return {
+        "pkgname": pkgname,
+        "impname": impname,
+        "channel": channel,
+        "depends": "[]",
+        "fn": f"{pkgname}-{version}-0.conda",
+        "url": f"https://example.com/{channel}/{pkgname}-{version}-0.conda",
+        "version": version,
+        "rootpkgs": "",
+    }
+
+
+@fixture
+def package_db(tmp_path):
+    return CondaPackageDB(dir=tmp_path)
+
+
+def test_batch_writer(package_db):
+    """
+    Entries are buffered until a batch is full or the writer is closed, then all
+    written in one transaction.
+    """
+    names = ["numpy", "pandas", "tqdm"]
+    with package_db.batch_writer(batch_size=2, flush_interval=60) as writer:
+        for name in names:
+            writer.insert_entry(**make_entry(name, name))
+        assert 2 == writer.n_written
+        assert 1 == len(writer.pending)
+    assert 3 == writer.n_written
+    for name in names:
+        assert name == package_db.retrieve_package(name, fetch_all=False)[0]
+
+
+def test_insert_entries(package_db):
+    """
+    Entries inserted in bulk are all written.
+    """
+    package_db.insert_entries(make_entry(n, n) for n in ["numpy", "tqdm"])
+
+    assert package_db.has_package("numpy")
+    assert package_db.has_package("tqdm")
+    assert not package_db.has_package("pandas")
+
+
+def test_lookup_imported_names(package_db):
+    """
+    Each imported name of a package is resolved to it, whether the package was
+    inserted singly or in a batch, and names no package provides are omitted.
+    """
+    package_db.insert_entry(**make_entry("pyyaml", "_yaml,yaml"))
+    package_db.insert_entries([make_entry("numpy", "numpy", channel="conda-forge")])
+    resolved = package_db.lookup_imported_names(["yaml", "numpy", "missing"])
+
+    assert {
+        "yaml": [("pyyaml", "main", "pyyaml-1.0-0.conda")],
+        "numpy": [("numpy", "conda-forge", "numpy-1.0-0.conda")],
+    } == resolved
+
+
+def test_conda_search_reqs(package_db):
+    """
+    The packages providing a scan's imports are looked up at once, grouped by
+    channel, and nothing is found (nor a database created) without a catalogue.
+    """
+    package_db.insert_entries(
+        [
+            make_entry("pyyaml", "_yaml,yaml"),
+            make_entry("numpy", "numpy", channel="conda-forge"),
+            make_entry("tqdm", "tqdm"),
+        ],
+    )
+    reqs = EnvReqs(EnvConfig())
+    reqs.registered_imports.update(["yaml", "_yaml", "numpy", "requests"])
+    conda_reqs = conda_search_reqs(reqs, db=package_db)
+    missing_db = CondaPackageDB(dir=package_db.directory / "missing", read_only=True)
+
+    package_db.export_import_index()
+    indexed_reqs = conda_search_reqs(reqs, index=ImportIndex(dir=package_db.directory))
+
+    assert {"conda-forge": ["numpy"], "main": ["pyyaml"]} == {
+        channel: [spec.package for spec in specs]
+        for channel, specs in conda_reqs.items()
+    }
+    assert {"conda-forge": ["numpy"], "main": ["pyyaml"]} == {
+        channel: [spec.package for spec in specs]
+        for channel, specs in indexed_reqs.items()
+    }
+    assert {} == conda_search_reqs(reqs, db=missing_db)
+    assert not missing_db.exists()
+
+
+def test_import_index(package_db):
+    """
+    The exported import index gives the same packages for each name as the
+    database, including names provided by several packages or none.
+    """
+    package_db.insert_entries(
+        [
+            make_entry("pyyaml", "_yaml,yaml"),
+            make_entry("ruamel.yaml", "ruamel,yaml"),
+            make_entry("yamlfix", "yamlfix", channel="conda-forge"),
+        ],
+    )
+    names = ["yaml", "_yaml", "ruamel", "yamlfix", "yam", "z", ""]
+    n_records = package_db.export_import_index()
+    with ImportIndex(dir=package_db.directory) as index:
+        resolved = index.lookup_imported_names(names)
+
+    assert 5 == n_records == len(index)
+    assert {
+        name: [(package, channel) for package, channel, _ in packages]
+        for name, packages in package_db.lookup_imported_names(names).items()
+    } == resolved
+
+
+def test_resume_population(package_db):
+    """
+    Archives inserted (by a writer or before progress was recorded) are done and
+    skipped on resuming, while failed ones are retried only if asked to be.
+    """
+    done, failed, pending, old = [
+        make_entry(name, name) for name in ["numpy", "pandas", "tqdm", "yaml"]
+    ]
+    package_db.insert_entry(**old)
+    urls = [e["url"] for e in [done, failed, pending, old]]
+    assert urls[:3] == package_db.resume_population(urls)
+    with package_db.batch_writer() as writer:
+        writer.insert_entry(**done)
+        writer.mark_failed(failed["url"], "FileNotFoundError()")
+
+    assert {
+        PopulationStatus.Done: 2,
+        PopulationStatus.Failed: 1,
+        PopulationStatus.Pending: 1,
+    } == package_db.population_progress()
+    assert urls[1:3] == package_db.resume_population(urls)
+    assert urls[2:3] == package_db.resume_population(urls, retry_failed=False)
+
+
+def test_prune_stale_archives(package_db):
+    """
+    Archives superseded by a newer one already inserted, or of packages no longer
+    listed, are deleted, but those whose replacement is not yet inserted are kept.
+    """
+    old_numpy, new_numpy, old_pandas, new_pandas, unlisted = [
+        make_entry("numpy", "numpy"),
+        make_entry("numpy", "numpy", version="2.0"),
+        make_entry("pandas", "pandas"),
+        make_entry("pandas", "pandas", version="2.0"),
+        make_entry("tqdm", "tqdm"),
+    ]
+    package_db.insert_entries([old_numpy, new_numpy, old_pandas, unlisted])
+    package_urls = {new_numpy["url"]: "numpy", new_pandas["url"]: "pandas"}
+    stale_urls = package_db.prune_stale_archives(package_urls)
+
+    assert sorted([old_numpy["url"], unlisted["url"]]) == sorted(stale_urls)
+    assert [new_pandas["url"]] == package_db.resume_population(package_urls)
+    assert {
+        "numpy": [("numpy", "main", new_numpy["fn"])],
+        "pandas": [("pandas", "main", old_pandas["fn"])],
+    } == package_db.lookup_imported_names(["numpy", "pandas", "tqdm"])
+
+
+def test_read_only_db(package_db):
+    """
+    A read-only database can be queried but not written to.
+    """
+    package_db.insert_entry(**make_entry("tqdm", "tqdm"))
+    read_only_db = CondaPackageDB(dir=package_db.directory, read_only=True)
+
+    assert read_only_db.has_package("tqdm")
+    with raises(sqlite3.OperationalError):
+        read_only_db.insert_entry(**make_entry("numpy", "numpy"))
+
+
+def test_read_only_db_sees_write_ahead_log(package_db):
+    """
+    A read-only database sees entries a batch writer has committed to the
+    write-ahead log before they are checkpointed into the database file.
+    """
+    with package_db.batch_writer() as writer:
+        writer.insert_entry(**make_entry("tqdm", "tqdm"))
+        writer.flush()  # committed to the WAL, which stays open uncheckpointed
+        read_only_db = CondaPackageDB(dir=package_db.directory, read_only=True)
+        assert {
+            "tqdm": [("tqdm", "main", "tqdm-1.0-0.conda")],
+        } == read_only_db.lookup_imported_names(["tqdm"])
+
+
+def test_read_only_db_before_imported_names(tmp_path):
+    """
+    A database built before imported names had their own table (which is only
+    filled in when it is opened writable) can still be looked up read-only.
+    """
+    with sqlite3.connect(tmp_path / CondaPackageDB.filename) as conn:
+        conn.execute(
+            """
+            CREATE TABLE conda_packages
+            (packagename varchar(100), importedname varchar(100),
+            channel tinytext, depends tinytext, filename tinytext,
+            url tinytext, version varchar(100), rootpkgs text,
+            Constraint pk_pid Primary key(channel, filename))
+            """,
+        )
+        conn.executemany(
+            CondaPackageDB.insert_sql,
+            [
+                tuple(make_entry(name, impname).values())
+                for name, impname in [("pyyaml", "_yaml,yaml"), ("tqdm", "tqdm")]
+            ],
+        )
+    conn.close()
+    read_only_db = CondaPackageDB(dir=tmp_path, read_only=True)
+
+    assert {
+        "yaml": [("pyyaml", "main", "pyyaml-1.0-0.conda")],
+        "tqdm": [("tqdm", "main", "tqdm-1.0-0.conda")],
+    } == read_only_db.lookup_imported_names(["yaml", "tqdm", "numpy"])
+
+
+def test_read_only_db_in_unwritable_dir(package_db):
+    """
+    A database populated by a batch writer is left out of WAL mode, so it can be
+    opened read-only where its directory is not writable.
+    """
+    with package_db.batch_writer() as writer:
+        writer.insert_entry(**make_entry("tqdm", "tqdm"))
+    package_db.directory.chmod(0o555)
+    try:
+        read_only_db = CondaPackageDB(dir=package_db.directory, read_only=True)
+        with read_only_db.connect() as conn:
+            (journal_mode,) = conn.execute("PRAGMA journal_mode").fetchone()
+        assert "delete" == journal_mode
+        assert read_only_db.has_package("tqdm")
+    finally:
+        package_db.directory.chmod(0o755)
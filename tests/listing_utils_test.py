@@ -0,0 +1,65 @@
+import json
+
+import pyzstd
+from pytest import mark
+
+from impscan.db.listing_utils import iter_json_object_items, iter_repodata_listings
+
+EXAMPLE_LISTINGS = {
+    "numpy": [
+        {"fn": "numpy-1.26.4-py312h2809609_0.conda", "version": "1.26.4"},
+        {"fn": "numpy-1.21.5-py39h6c91a56_3.tar.bz2", "version": "1.21.5"},
+    ],
+    "tqdm": [{"fn": "tqdm-4.19.5-py27_0.conda", "version": "4.19.5", "size": 60}],
+    "empty": [],
+    'quoted "}"': {"depends": ["a, b", "\\"]},
+}
+
+
+@mark.parametrize("chunk_size", [1, 7, 2**20])
+@mark.parametrize("indent", [None, 2])
+def test_iter_json_object_items(tmp_path, chunk_size, indent):
+    """
+    The items are parsed one at a time the same as the whole object would be,
+    however the file is split into chunks.
+    """
+    listings_path = tmp_path / "conda_listings.json"
+    listings_path.write_text(json.dumps(EXAMPLE_LISTINGS, indent=indent))
+    items = iter_json_object_items(listings_path, chunk_size=chunk_size)
+
+    assert [*EXAMPLE_LISTINGS.items()] == [*items]
+
+
+def test_iter_repodata_listings(tmp_path):
+    """
+    The builds of each package in a mirror's repodata (compressed or not) are
+    listed together across subdirs, with URLs to download them from the channel.
+    """
+    noarch = {
+        "packages.conda": {
+            "tqdm-4.66.1-pyhd8ed1ab_0.conda": {"name": "tqdm", "version": "4.66.1"},
+        },
+    }
+    linux_64 = {
+        "packages": {
+            "numpy-1.21.5-py39_3.tar.bz2": {"name": "numpy", "version": "1.21.5"},
+        },
+        "packages.conda": {
+            "numpy-1.26.4-py312_0.conda": {"name": "numpy", "version": "1.26.4"},
+        },
+    }
+    (tmp_path / "noarch").mkdir()
+    (tmp_path / "noarch" / "repodata.json").write_text(json.dumps(noarch))
+    (tmp_path / "linux-64").mkdir()
+    (tmp_path / "linux-64" / "repodata.json.zst").write_bytes(
+        pyzstd.compress(json.dumps(linux_64).encode()),
+    )
+    channel_url = "https://conda.anaconda.org/conda-forge"
+    listings = dict(iter_repodata_listings(channels={channel_url: tmp_path}))
+
+    assert ["numpy", "tqdm"] == [*listings]
+    assert [
+        f"{channel_url}/linux-64/numpy-1.21.5-py39_3.tar.bz2",
+        f"{channel_url}/linux-64/numpy-1.26.4-py312_0.conda",
+    ] == [build["url"] for build in listings["numpy"]]
+    assert ["1.21.5", "1.26.4"] == [build["version"] for build in listings["numpy"]]
@@ -0,0 +1,342 @@
+import os
+import shutil
+import sys
+
+from pytest import fixture, mark, raises
+
+from impscan import cli
+
+from impscan.config import EnvConfig
+from impscan.scanner.import_utils import (
+    ImportContext,
+    exclude_sibling_module_names,
+    get_sibling_module_names,
+)
+from impscan.scanner import module_utils
+from impscan.scanner.module_utils import stdlib_module_names
+from impscan.scanner.requirement import EnvReqs
+from impscan.scanner.sanitiser import ignore_dir_globs, walk_python_files
+from impscan.scanner.scan import (
+    iter_imported_names,
+    iter_scan_imports,
+    scan_imports,
+    scan_imports_many,
+)
+from impscan.scanner.scan_cache import ScanCache
+
+EXAMPLE_MODULES = {
+    "main.py": "import os\nimport numpy as np\nfrom helpers import tidy\nimport sub\n",
+    "helpers.py": "from pandas.api import types\nfrom . import main\n",
+    "sub/__init__.py": "",
+    "sub/tool.py": "import requests, sys\nfrom tqdm.auto import tqdm\n",
+}
+
+
+@fixture
+def example_project(tmp_path):
+    for rel_path, source in EXAMPLE_MODULES.items():
+        py_file = tmp_path / rel_path
+        py_file.parent.mkdir(parents=True, exist_ok=True)
+        py_file.write_text(source)
+    return tmp_path
+
+
+def make_config(**kwargs):
+    return EnvConfig(report=False, banned_imports=[], build_system=False, **kwargs)
+
+
+def test_serial_scan(example_project):
+    """
+    Stdlib, relative and sibling module imports are dropped, leaving the names
+    of the third-party top-level packages.
+    """
+    reqs = scan_imports(source_path=example_project, env_config=make_config())
+
+    assert {"numpy", "pandas", "requests", "tqdm"} == reqs.registered_imports
+    assert len(EXAMPLE_MODULES) == len(reqs.registered_files)
+
+
+def test_iter_scan_imports(example_project):
+    """
+    Each file's imports are yielded in walk order, and an aggregate-only scan
+    registers their union without keeping the files.
+    """
+    records = list(iter_scan_imports(example_project, env_config=make_config()))
+    reqs = scan_imports(example_project, env_config=make_config(keep_files=False))
+
+    assert sorted(EXAMPLE_MODULES) == [
+        r.path.relative_to(example_project).as_posix() for r in records
+    ]
+    assert [{"pandas"}, {"numpy"}, set(), {"requests", "tqdm"}] == [
+        r.imports for r in records
+    ]
+    assert set().union(*(r.imports for r in records)) == reqs.registered_imports
+    assert [] == reqs.registered_files
+    assert len(EXAMPLE_MODULES) == reqs.n_files
+
+
+def test_parallel_scan_matches_serial(example_project):
+    """
+    Scanning on a process pool registers the same imports and files as scanning
+    serially.
+    """
+    serial = scan_imports(source_path=example_project, env_config=make_config())
+    parallel = scan_imports(
+        source_path=example_project,
+        env_config=make_config(workers=2),
+    )
+
+    assert serial.registered_imports == parallel.registered_imports
+    assert [f.path for f in serial.registered_files] == [
+        f.path for f in parallel.registered_files
+    ]
+
+
+def test_negative_workers():
+    """
+    A negative number of workers is rejected rather than passed to the pool.
+    """
+    with raises(ValueError):
+        make_config(workers=-1)
+
+
+def test_iter_imported_names_is_lazy(example_project):
+    """
+    Each file's imports are yielded as soon as it is parsed, having only taken
+    that file from the walk (and looked it up in the cache).
+    """
+    taken = []
+
+    def walk():
+        for py_file in sorted(example_project.rglob("*.py")):
+            taken.append(py_file)
+            yield py_file
+
+    with ScanCache(directory=example_project) as cache:
+        records = iter_imported_names(walk(), scan_cache=cache)
+        first_file, _, _ = next(records)
+
+    assert [first_file] == taken
+
+
+def test_scan_many_roots(example_project):
+    """
+    Scanning several roots (sharing a pool) gives one result per root, the same
+    as scanning each alone.
+    """
+    roots = [example_project / "sub", example_project / "helpers.py"]
+    cfg = make_config(workers=2)
+    per_root = scan_imports_many(source_paths=iter(roots), env_config=cfg)
+
+    assert [scan_imports(r, cfg).registered_imports for r in roots] == [
+        r.registered_imports for r in per_root
+    ]
+    assert {"pandas", "requests", "tqdm"} == (
+        EnvReqs.combined(per_root).registered_imports
+    )
+
+
+def test_cached_scan(example_project):
+    """
+    A cached scan stores each file's imports and only reparses files that have
+    since changed, giving the same result as an uncached scan.
+    """
+    cfg = make_config(cache=True)
+    first = scan_imports(source_path=example_project, env_config=cfg)
+    (example_project / "helpers.py").write_text("import yaml\n")
+    second = scan_imports(source_path=example_project, env_config=cfg)
+    uncached = scan_imports(source_path=example_project, env_config=make_config())
+
+    assert (example_project / ScanCache.filename).exists()
+    assert {"numpy", "pandas", "requests", "tqdm"} == first.registered_imports
+    assert {"numpy", "yaml", "requests", "tqdm"} == second.registered_imports
+    assert uncached.registered_imports == second.registered_imports
+
+
+def test_scan_cache_content_hash_fallback(example_project):
+    """
+    A file whose modification time changed but whose content did not is still
+    read from the cache.
+    """
+    main_py = example_project / "main.py"
+    stored = {"stored": frozenset({ImportContext.TopLevel})}
+    with ScanCache(directory=example_project) as cache:
+        cache.store(main_py, stored)
+    st = main_py.stat()
+    os.utime(main_py, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    with ScanCache(directory=example_project) as cache:
+        hit = cache.lookup(main_py)
+        main_py.write_text("import numpy as numpy_\n")
+        miss = cache.lookup(main_py)
+
+    assert stored == hit
+    assert miss is None
+
+
+def test_scan_cache_keeps_both_modes(example_project):
+    """
+    A file's imports are cached separately for nested and module-level scans,
+    so alternating between them does not evict either.
+    """
+    main_py = example_project / "main.py"
+    top_level = {"numpy": frozenset({ImportContext.TopLevel})}
+    nested = {"numpy": frozenset({ImportContext.Lazy})}
+    with ScanCache(directory=example_project) as cache:
+        cache.store(main_py, top_level)
+        cache.store(main_py, nested, nested=True)
+
+        assert top_level == cache.lookup(main_py)
+        assert nested == cache.lookup(main_py, nested=True)
+
+
+def test_explicit_stdlib_modules(example_project):
+    """
+    An explicit list of the target Python's stdlib modules is used in place of
+    the running interpreter's.
+    """
+    cfg = make_config(stdlib_modules=frozenset({"numpy", "sys"}))
+    reqs = scan_imports(source_path=example_project, env_config=cfg)
+
+    assert {"os", "pandas", "requests", "tqdm"} == reqs.registered_imports
+
+
+def test_stdlib_module_names_memoised():
+    """
+    The stdlib module names are computed once and shared between callers.
+    """
+    assert stdlib_module_names() is stdlib_module_names()
+    assert {"os", "sys", "pathlib"} <= stdlib_module_names()
+
+
+def test_stdlib_module_names_patch_version():
+    """
+    A target version is reduced to its minor version, so giving the running
+    Python's patch version uses its own stdlib module names.
+    """
+    patch_version = "{}.{}.99".format(*sys.version_info)
+    assert stdlib_module_names() == stdlib_module_names(patch_version)
+
+
+@mark.parametrize("interpreter", [None, shutil.which("false")])
+def test_missing_target_python(example_project, monkeypatch, capsys, interpreter):
+    """
+    The CLI reports a target Python version whose interpreter is missing (or can't
+    run, like a pyenv shim for a version not installed) as a usage error.
+    """
+    monkeypatch.setattr(module_utils.shutil, "which", lambda name: interpreter)
+    argv = ["impscan", str(example_project), "-q", "-v", "2.7.18"]
+    monkeypatch.setattr(sys, "argv", argv)
+    with raises(SystemExit) as exit_info:
+        cli.main()
+
+    assert 2 == exit_info.value.code
+    assert "--stdlib-list" in capsys.readouterr().err
+
+
+def test_sibling_module_names(tmp_path):
+    """
+    A module's siblings are the other `.py` files and directories alongside it,
+    including a directory with the same name as the module itself, and the
+    listing of the directory is shared between its modules via the cache.
+    """
+    for name in ["solo.py", "pair.py", "other.txt"]:
+        (tmp_path / name).write_text("")
+    (tmp_path / "pair").mkdir()
+    sibling_cache = {}
+    solo_siblings = get_sibling_module_names(tmp_path / "solo.py", sibling_cache)
+    pair_siblings = get_sibling_module_names(tmp_path / "pair.py", sibling_cache)
+
+    assert {"pair"} == solo_siblings
+    assert {"pair", "solo"} == pair_siblings
+    assert [tmp_path] == [*sibling_cache]
+    assert {"solo"} == exclude_sibling_module_names(
+        {"solo", "pair"},
+        tmp_path / "solo.py",
+        sibling_cache,
+    )
+
+
+def test_walk_python_files(tmp_path):
+    """
+    Virtual environments, build directories, user-given globs and paths ignored
+    by `.gitignore` files (including negated and nested rules) are not walked.
+    """
+    tree = {
+        ".gitignore": "# generated code\ngenerated/\n*_pb2.py\n!keep_pb2.py\n",
+        "main.py": "",
+        "msg_pb2.py": "",
+        "keep_pb2.py": "",
+        "vendored.py": "",
+        ".venv/lib/site.py": "",
+        "build/lib/main.py": "",
+        "generated/api.py": "",
+        "pkg/.gitignore": "/local.py\n",
+        "pkg/local.py": "",
+        "pkg/deeper/local.py": "",
+        "pkg/generated.py": "",
+    }
+    for rel_path, content in tree.items():
+        (tmp_path / rel_path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / rel_path).write_text(content)
+    walked = walk_python_files(tmp_path, ignore_globs=[*ignore_dir_globs, "vendor*"])
+    unignored = walk_python_files(tmp_path, ignore_globs=[], use_gitignore=False)
+
+    assert [
+        "keep_pb2.py",
+        "main.py",
+        "pkg/generated.py",
+        "pkg/deeper/local.py",
+    ] == [p.relative_to(tmp_path).as_posix() for p in walked]
+    assert len([p for p in tree if p.endswith(".py")]) == len([*unignored])
+
+
+def test_fast_extractor_scan(example_project):
+    """
+    Scanning with the fast extractor registers the same imports as parsing.
+    """
+    parsed = scan_imports(source_path=example_project, env_config=make_config())
+    scanned = scan_imports(
+        source_path=example_project,
+        env_config=make_config(extractor="fast", workers=2),
+    )
+
+    assert parsed.registered_imports == scanned.registered_imports
+
+
+NESTED_SOURCE = """
+from typing import TYPE_CHECKING
+import numpy
+try:
+    import ujson as json
+except ImportError:
+    import json
+if TYPE_CHECKING:
+    from pandas import DataFrame
+class Model:
+    import torch
+    def fit(self):
+        import sklearn.linear_model
+        try:
+            import numpy
+        except (ModuleNotFoundError, OSError):
+            pass
+"""
+
+
+def test_nested_import_contexts(tmp_path):
+    """
+    Imports anywhere in a module are found when `nested` is set, tagged with the
+    contexts they are imported in (the most specific one for nested contexts).
+    """
+    (tmp_path / "model.py").write_text(NESTED_SOURCE)
+    top_level = scan_imports(source_path=tmp_path, env_config=make_config())
+    nested = scan_imports(source_path=tmp_path, env_config=make_config(nested=True))
+
+    assert {"numpy"} == top_level.registered_imports
+    assert {
+        "numpy": {ImportContext.TopLevel, ImportContext.Optional},
+        "ujson": {ImportContext.Optional},
+        "pandas": {ImportContext.TypeChecking},
+        "torch": {ImportContext.TopLevel},
+        "sklearn": {ImportContext.Lazy},
+    } == nested.import_contexts
@@ -0,0 +1,117 @@
+import struct
+from pathlib import Path
+
+import _json
+from pytest import mark, raises
+
+from impscan.conda_meta.symbol_utils import exported_symbols
+
+LC_DYLD_EXPORTS_TRIE = 0x80000033
+SHT_STRTAB, SHT_DYNSYM = 3, 11
+
+
+def make_elf(defined: list[str], undefined: list[str]) -> bytes:
+    """
+    Build a 64-bit little-endian ELF whose only sections are a `.dynstr` string
+    table and a `.dynsym` symbol table of the `defined` and `undefined` symbols.
+    """
+    names = [*defined, *undefined]
+    dynstr = b"\0" + b"".join(name.encode() + b"\0" for name in names)
+    symbols = [struct.pack("<IBBHQQ", 0, 0, 0, 0, 0, 0)]  # the null symbol
+    st_name = 1
+    for name in names:
+        st_shndx = 1 if name in defined else 0  # section 0 means undefined
+        symbols.append(struct.pack("<IBBHQQ", st_name, 0x12, 0, st_shndx, 0, 0))
+        st_name += len(name.encode()) + 1
+    dynsym = b"".join(symbols)
+    dynstr_offset = 64  # after the ELF header
+    dynsym_offset = dynstr_offset + len(dynstr)
+    shoff = dynsym_offset + len(dynsym)
+    section_headers = [
+        struct.pack("<IIQQQQIIQQ", 0, 0, 0, 0, 0, 0, 0, 0, 0, 0),
+        struct.pack(
+            "<IIQQQQIIQQ",
+            *(0, SHT_STRTAB, 0, 0, dynstr_offset, len(dynstr), 0, 0, 1, 0),
+        ),
+        struct.pack(
+            "<IIQQQQIIQQ",
+            *(0, SHT_DYNSYM, 0, 0, dynsym_offset, len(dynsym), 1, 1, 8, 24),
+        ),
+    ]
+    ident = b"\x7fELF\x02\x01\x01" + bytes(9)
+    # The section names (all empty) are read from `.dynstr` too, at index 1
+    header = ident + struct.pack(
+        "<HHIQQQIHHHHHH",
+        *(3, 62, 1, 0, 0, shoff, 0, 64, 0, 0, 64, len(section_headers), 1),
+    )
+    return header + dynstr + dynsym + b"".join(section_headers)
+
+
+def trie_node(export: bool, children: list[tuple[str, int]]) -> bytes:
+    """
+    Encode a trie node (with a 2 byte export info if `export`) whose children
+    are each an edge label and node offset (all offsets being under 128, so a
+    single byte in ULEB128).
+    """
+    node = b"\x02\x00\x00" if export else b"\x00"
+    node += bytes([len(children)])
+    for label, offset in children:
+        node += label.encode() + b"\0" + bytes([offset])
+    return node
+
+
+def make_macho(trie: bytes) -> bytes:
+    header = struct.pack("<IIIIIIII", 0xFEEDFACF, 0x01000007, 3, 6, 1, 16, 0, 0)
+    trie_offset = len(header) + 16
+    command = struct.pack("<IIII", LC_DYLD_EXPORTS_TRIE, 16, trie_offset, len(trie))
+    return header + command + trie
+
+
+def test_elf_dynamic_symbols():
+    """
+    The defined symbols in an ELF binary's `.dynsym` section are read, and the
+    undefined ones (imported from other libraries) are not.
+    """
+    elf = make_elf(defined=["PyInit_foo", "helper"], undefined=["PyModule_Create2"])
+    assert {"PyInit_foo", "helper"} == exported_symbols(elf)
+
+
+@mark.skipif(not hasattr(_json, "__file__"), reason="_json is built in")
+def test_lib_dynload_symbols():
+    """
+    The `lib-dynload` extension module `_json` exports its module init function.
+    """
+    symbols = exported_symbols(Path(_json.__file__).read_bytes())
+    assert {"PyInit__json"} == {s for s in symbols if s.startswith("PyInit_")}
+
+
+def test_macho_export_trie():
+    """
+    The symbols exported by a Mach-O binary are read from its export trie.
+    """
+    # root --"_"--> node 5 --"PyInit_foo"--> node 27, --"helper"--> node 31
+    trie = b"".join(
+        [
+            trie_node(False, [("_", 5)]),
+            trie_node(False, [("PyInit_foo", 27), ("helper", 31)]),
+            trie_node(True, []),
+            trie_node(True, []),
+        ],
+    )
+    assert {"_PyInit_foo", "_helper"} == exported_symbols(make_macho(trie))
+
+
+def test_malformed_elf():
+    """
+    An ELF binary with an invalid class (neither 32 nor 64-bit) raises `ValueError`.
+    """
+    with raises(ValueError):
+        exported_symbols(b"\x7fELF\x03\x01\x01" + bytes(57))
+
+
+def test_not_a_shared_library():
+    """
+    Bytes that are not an ELF or Mach-O binary raise `ValueError`.
+    """
+    with raises(ValueError):
+        exported_symbols(b"#!/bin/sh\n")
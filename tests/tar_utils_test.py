@@ -0,0 +1,61 @@
+import bz2
+import io
+import random
+import tarfile
+
+from pytest import raises
+
+from impscan.conda_meta.tar_utils import read_tar_stream_members
+
+INFO_FILES = {
+    "info/index.json": b'{"name": "example"}',
+    "info/about.json": b"{}",
+    "info/paths.json": b'{"paths": []}',
+}
+
+
+def make_tar_bz2(files: dict[str, bytes]) -> bytes:
+    buf = io.BytesIO()
+    # Compress in the smallest blocks (100kB) so the start can be read alone
+    with tarfile.open(fileobj=buf, mode="w:bz2", compresslevel=1) as tf:
+        for name, data in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+    return buf.getvalue()
+
+
+def test_read_tar_stream_members_order():
+    """
+    The members are returned in the order requested, not the tarball order.
+    """
+    tarball = make_tar_bz2(INFO_FILES)
+    paths = ["info/paths.json", "info/about.json", "info/index.json"]
+    with tarfile.open(fileobj=io.BytesIO(tarball), mode="r|bz2") as tf:
+        members = read_tar_stream_members(tf, paths)
+    assert [INFO_FILES[p] for p in paths] == [m.read() for m in members]
+
+
+def test_read_tar_stream_members_stops_early():
+    """
+    Reading stops once the requested members are found, so the rest of the
+    tarball (here truncated) is never read.
+    """
+    payload = random.Random(0).randbytes(2**20)  # incompressible
+    tarball = make_tar_bz2({**INFO_FILES, "lib/payload.bin": payload})
+    truncated = tarball[: len(tarball) // 2]
+    with raises(Exception):
+        bz2.decompress(truncated)  # the whole tarball can't be read
+    with tarfile.open(fileobj=io.BytesIO(truncated), mode="r|bz2") as tf:
+        [index] = read_tar_stream_members(tf, ["info/index.json"])
+    assert INFO_FILES["info/index.json"] == index.read()
+
+
+def test_read_tar_stream_members_missing():
+    """
+    A missing member raises `FileNotFoundError`.
+    """
+    tarball = make_tar_bz2(INFO_FILES)
+    with tarfile.open(fileobj=io.BytesIO(tarball), mode="r|bz2") as tf:
+        with raises(FileNotFoundError):
+            read_tar_stream_members(tf, ["info/missing.json"])
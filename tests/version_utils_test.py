@@ -0,0 +1,39 @@
+from impscan.db.version_utils import select_newest_archive, sort_package_json_by_version
+
+EXAMPLE_BUILDS = [
+    {"fn": "a-1.0-0.tar.bz2", "version": "1.0", "build": "0"},
+    {"fn": "a-1.10-0.tar.bz2", "version": "1.10", "build": "0"},
+    {"fn": "a-1.10-0.conda", "version": "1.10", "build": "0"},
+    {"fn": "a-1.9-1.conda", "version": "1.9", "build": "1"},
+    {"fn": "a-2.0rc1-0.conda", "version": "2.0rc1", "build": "0"},
+    {"fn": "a-1.10-0-dup.conda", "version": "1.10", "build": "0"},
+    {"fn": "a-2.0-0.zip", "version": "2.0", "build": "0"},
+]
+
+
+def select_by_sorting(builds):
+    """
+    Select the newest archive as was done before, by sorting all the builds.
+    """
+    ordered = sort_package_json_by_version(builds)
+    for suffix in [".conda", ".tar.bz2"]:
+        for build in ordered:
+            if build["fn"].endswith(suffix):
+                return build
+    return None
+
+
+def test_select_newest_archive():
+    """
+    The newest `.conda` archive is preferred to any `.tar.bz2` archive, ties going
+    to the first listed, as when sorting all the builds by version.
+    """
+    tied = EXAMPLE_BUILDS[:4] + EXAMPLE_BUILDS[5:]
+    tar_bz2_only = [b for b in EXAMPLE_BUILDS if not b["fn"].endswith(".conda")]
+    epochs = [dict(b, version=f"1!{b['version']}") for b in EXAMPLE_BUILDS[:2]]
+    epochs += EXAMPLE_BUILDS[2:]
+
+    assert "a-2.0rc1-0.conda" == select_newest_archive(EXAMPLE_BUILDS)["fn"]
+    assert "a-1.10-0.conda" == select_newest_archive(tied)["fn"]
+    for builds in [EXAMPLE_BUILDS, tied, tar_bz2_only, epochs, []]:
+        assert select_by_sorting(builds) is select_newest_archive(builds)
@@ -0,0 +1,33 @@
+import io
+import tarfile
+
+import pyzstd
+
+from impscan.conda_meta.zstd_utils import extract_zst
+
+PKG_FILES = {
+    "lib/python3.9/site-packages/example/__init__.py": b"import os\n",
+    "lib/python3.9/site-packages/example/_ext.so": b"\x7fELF",
+}
+
+
+def make_tar_zst(files: dict[str, bytes]) -> bytes:
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w") as tf:
+        for name, data in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+    return pyzstd.compress(buf.getvalue())
+
+
+def test_extract_zst():
+    """
+    The members are extracted from bytes or a file-like object, in the order
+    requested.
+    """
+    tarball = make_tar_zst(PKG_FILES)
+    paths = [*reversed(PKG_FILES)]
+    for zst in [tarball, io.BytesIO(tarball)]:
+        members = extract_zst(zst, paths)
+        assert [PKG_FILES[p] for p in paths] == [m.read() for m in members]